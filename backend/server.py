@@ -1,30 +1,48 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Response, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Response, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import OperationFailure, BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 import uuid
 from datetime import datetime, timezone, timedelta
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import json
 import base64
-from pywebpush import webpush, WebPushException
+from pywebpush import WebPusher
+from py_vapid import Vapid
 import httpx
 import secrets
 import bcrypt
 import re
+import asyncio
+import hashlib
+import time
+import socket
+import random
+import contextvars
+import string
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware: native BSON dates come back as aware UTC datetimes
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, tzinfo=timezone.utc)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -43,6 +61,105 @@ VAPID_CLAIMS = {
     "sub": "mailto:donna@emergent.ai"
 }
 
+# Session token -> user cache used by get_current_user
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get('SESSION_CACHE_TTL_SECONDS', '300'))
+SESSION_CACHE_NEGATIVE_TTL_SECONDS = int(os.environ.get('SESSION_CACHE_NEGATIVE_TTL_SECONDS', '10'))
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', '10000'))
+
+# bcrypt runs on a bounded worker pool so logins don't stall the event loop
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '4'))
+
+# Operator accounts allowed to use /api/admin endpoints (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# Web Push delivery engine
+PUSH_MAX_CONCURRENCY = int(os.environ.get('PUSH_MAX_CONCURRENCY', '50'))
+PUSH_TIMEOUT_SECONDS = float(os.environ.get('PUSH_TIMEOUT_SECONDS', '10'))
+PUSH_CRYPTO_WORKERS = int(os.environ.get('PUSH_CRYPTO_WORKERS', '4'))
+PUSH_TTL_SECONDS = int(os.environ.get('PUSH_TTL_SECONDS', '0'))  # 0 = deliver now or drop (pywebpush default)
+PUSH_MAX_DEVICES_PER_SESSION = int(os.environ.get('PUSH_MAX_DEVICES_PER_SESSION', '20'))
+
+# Reminder scheduling writes in insert_many chunks of this size
+REMINDER_INSERT_BATCH_SIZE = int(os.environ.get('REMINDER_INSERT_BATCH_SIZE', '1000'))
+CALENDAR_IMPORT_MAX_EVENTS = int(os.environ.get('CALENDAR_IMPORT_MAX_EVENTS', '1000'))
+# GET /calendar/events page size (the next page is linked through the X-Next-Cursor header)
+CALENDAR_PAGE_DEFAULT_LIMIT = 100
+CALENDAR_PAGE_MAX_LIMIT = 500
+# Fields each calendar view renders (GET /calendar/events?view=...)
+CALENDAR_VIEW_FIELDS = {
+    "month": ["id", "title", "category", "datetime_utc"],  # MonthlyCalendar grid
+    "week": ["id", "title", "description", "category", "datetime_utc", "reminder"],  # EventCard list
+    "day": ["id", "title", "description", "category", "datetime_utc", "reminder"],  # UpcomingToday
+}
+# Periodic cleanup of reminders whose calendar event no longer exists
+REMINDER_GC_INTERVAL_SECONDS = float(os.environ.get('REMINDER_GC_INTERVAL_SECONDS', '3600'))
+REMINDER_GC_BATCH_SIZE = int(os.environ.get('REMINDER_GC_BATCH_SIZE', '500'))
+
+# Background dispatcher for scheduled notifications (event reminders)
+NOTIFICATION_DISPATCHER_ENABLED = os.environ.get('NOTIFICATION_DISPATCHER_ENABLED', 'true').lower() == 'true'
+NOTIFICATION_DISPATCH_INTERVAL_SECONDS = float(os.environ.get('NOTIFICATION_DISPATCH_INTERVAL_SECONDS', '30'))
+NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.environ.get('NOTIFICATION_DISPATCH_BATCH_SIZE', '100'))
+NOTIFICATION_DISPATCH_MAX_PAGES = int(os.environ.get('NOTIFICATION_DISPATCH_MAX_PAGES', '50'))  # per tick, so one tick can't run forever
+# Claimed notifications are leased to one worker; a crashed worker's claims come back after the lease
+NOTIFICATION_LEASE_SECONDS = int(os.environ.get('NOTIFICATION_LEASE_SECONDS', '120'))
+# Failed pushes are retried with jittered exponential backoff, then dead-lettered
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', '5'))
+NOTIFICATION_RETRY_BASE_SECONDS = float(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', '30'))
+NOTIFICATION_RETRY_MAX_SECONDS = float(os.environ.get('NOTIFICATION_RETRY_MAX_SECONDS', '3600'))
+DISPATCHER_WORKER_ID = os.environ.get('DISPATCHER_WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# Chat detection pipeline
+HEALTH_CONFIDENCE_THRESHOLD = 0.6
+GIFT_CONFIDENCE_THRESHOLD = 0.7
+# Start the health and gift detectors together instead of one after another
+SPECULATIVE_DETECTION = os.environ.get('SPECULATIVE_DETECTION', 'true').lower() == 'true'
+# Also start Donna's conversational reply up front (discarded if a detector wins)
+SPECULATIVE_REPLY = os.environ.get('SPECULATIVE_REPLY', 'false').lower() == 'true'
+# Classify health, delete, gift and event intents with one structured LLM call
+UNIFIED_INTENT_EXTRACTION = os.environ.get('UNIFIED_INTENT_EXTRACTION', 'false').lower() == 'true'
+EVENT_CONFIDENCE_THRESHOLD = 0.6
+
+# Health log confirmations: "template" phrases them from HEALTH_CONFIRMATION_TEMPLATES (no model
+# call), "llm" asks the model and uses the templates only as its fallback
+HEALTH_CONFIRMATION_MODE = os.environ.get('HEALTH_CONFIRMATION_MODE', 'template').lower()
+# Optional JSON file of {"pool name": ["variant", ...]} replacing the built-in pools it names
+HEALTH_CONFIRMATION_TEMPLATES_PATH = os.environ.get('HEALTH_CONFIRMATION_TEMPLATES_PATH')
+# Meals from this many calories up sometimes get the "lighter next meal" tip
+HEALTH_HEAVY_MEAL_CALORIES = int(os.environ.get('HEALTH_HEAVY_MEAL_CALORIES', '900'))
+HEALTH_BALANCE_TIP_CHANCE = float(os.environ.get('HEALTH_BALANCE_TIP_CHANCE', '0.3'))
+
+# LLM model used by the detectors and Donna's replies
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-4o-mini"
+# LLM gateway: by default completions go through LlmChat (a new client per call), which is what
+# the Emergent universal key works with. With LLM_BASE_URL set (any OpenAI-compatible API, and
+# a key that API accepts) they go over one pooled HTTP client instead
+LLM_API_KEY = os.environ.get('LLM_API_KEY') or openai_api_key
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL', '').rstrip('/')
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', '20'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '30'))  # prompts without their own timeout
+# Admission control for model calls: global and per-user in-flight caps, a request-rate token
+# bucket, and a bounded queue; calls that can't get a slot in time fail fast with 429
+LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', '32'))
+LLM_MAX_IN_FLIGHT_PER_USER = int(os.environ.get('LLM_MAX_IN_FLIGHT_PER_USER', '3'))  # a chat turn runs up to 3 calls at once
+LLM_RATE_PER_SECOND = float(os.environ.get('LLM_RATE_PER_SECOND', '10'))  # 0 = no rate limit
+LLM_RATE_BURST = int(os.environ.get('LLM_RATE_BURST', '20'))
+LLM_MAX_QUEUED = int(os.environ.get('LLM_MAX_QUEUED', '200'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '5'))
+# Hard ceiling on the model time of one chat turn, shared by the detectors and the reply
+LLM_CHAT_BUDGET_SECONDS = float(os.environ.get('LLM_CHAT_BUDGET_SECONDS', '20'))
+# Circuit breaker: once LLM_BREAKER_ERROR_RATE of the calls in the window fail (timeouts and
+# errors, at least LLM_BREAKER_MIN_CALLS of them), model calls are skipped in favour of the
+# deterministic fallbacks for LLM_BREAKER_OPEN_SECONDS, then a single probe call is let through
+LLM_BREAKER_WINDOW_SECONDS = float(os.environ.get('LLM_BREAKER_WINDOW_SECONDS', '60'))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10'))
+LLM_BREAKER_ERROR_RATE = float(os.environ.get('LLM_BREAKER_ERROR_RATE', '0.5'))
+LLM_BREAKER_OPEN_SECONDS = float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30'))
+
+# Detector result cache (in-process LRU + Mongo collection)
+DETECTOR_CACHE_ENABLED = os.environ.get('DETECTOR_CACHE_ENABLED', 'true').lower() == 'true'
+DETECTOR_CACHE_TTL_SECONDS = int(os.environ.get('DETECTOR_CACHE_TTL_SECONDS', str(7 * 24 * 60 * 60)))
+DETECTOR_CACHE_MAX_ENTRIES = int(os.environ.get('DETECTOR_CACHE_MAX_ENTRIES', '2048'))
 
 
 # Donna's personality system message
@@ -50,6 +167,10 @@ DONNA_SYSTEM_MESSAGE = """You are Donna, the smartest most tech-forward AI assis
 
 IMPORTANT: When you confirm creating a calendar event, be PROACTIVE and CONFIDENT. Don't ask permission - the event is already created with default reminders. Confirm it's done and be helpful. Example: 'Perfect! I've scheduled your meeting for tomorrow at 7 PM with reminders set for 12 hours and 2 hours before. You're all set!'"""
 
+# What Donna says when her reply can't be generated in time (LLM circuit open or budget spent)
+DONNA_FALLBACK_REPLY = "I'm running a little behind right now. Give me a moment and ask me again."
+EVENT_CREATED_FALLBACK_REPLY = "Done! It's on your calendar with reminders set for 12 hours and 2 hours before. You're all set!"
+
 # Models
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -67,6 +188,11 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
 
+class ChatTurn(BaseModel):
+    response: str = ""  # Reply already decided by a handler (health, gift, notes)
+    reply_prompt: Optional[str] = None  # Otherwise Donna's reply is generated from this text
+    fallback_response: str = DONNA_FALLBACK_REPLY  # Used instead when that reply can't be generated in time
+
 # New model for tracking conversation context
 class ConversationContext(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -83,9 +209,22 @@ class CalendarEvent(BaseModel):
     datetime_utc: datetime  # Store complete datetime in UTC
     category: Optional[str] = "personal"  # Default category
     reminder: bool = True
+    reminder_policy: str = "standard"  # Key into REMINDER_POLICIES
     session_id: str  # User session ID for data isolation
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CalendarEventView(BaseModel):
+    """A calendar event trimmed to the fields one view renders (unset fields are omitted)"""
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    datetime_utc: Optional[datetime] = None
+    category: Optional[str] = None
+    reminder: Optional[bool] = None
+    reminder_policy: Optional[str] = None
+    session_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class CalendarEventCreate(BaseModel):
     title: str
     description: Optional[str] = None
@@ -96,16 +235,9 @@ class CalendarEventCreate(BaseModel):
 class CalendarEventUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
+    datetime_utc: Optional[str] = None  # ISO string datetime in UTC from frontend
     category: Optional[str] = None
-
-class CalendarReminder(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    event_id: str
-    reminder_datetime: datetime
-    session_id: str
-    message: str
-    sent: bool = False
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    reminder: Optional[bool] = None
 
 class CareerGoal(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -125,6 +257,8 @@ class HealthEntry(BaseModel):
     type: str  # meal, hydration, sleep, exercise
     description: str
     value: Optional[str] = None
+    calories: Optional[int] = None  # meal entries, extracted at log time
+    protein: Optional[int] = None  # grams, meal entries
     session_id: Optional[str] = "default"  # Add session_id for tracking
     datetime_utc: datetime  # Store complete datetime in UTC
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -217,6 +351,7 @@ class HealthProcessingResult(BaseModel):
     delete_type: Optional[str] = None  # 'hydration', 'meal', 'sleep', 'last'
     description: str
     confidence: float
+    source: str = "llm"  # 'llm' or 'rules' (local fast path)
 
 class DailyHealthStats(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -271,6 +406,17 @@ class WeeklyAnalyticsRequest(BaseModel):
     session_id: str
     week_offset: int = 0  # 0 = current week, -1 = last week, etc.
 
+# Hydration conversions shared by the detection prompts and the local fast path
+HYDRATION_CONVERSIONS_ML = {
+    "glass": 250,
+    "cup": 200,
+    "bottle": 500,
+    "sipper": 400,
+    "mug": 300
+}
+
+HYDRATION_CONVERSION_LINES = "\n".join(f"- {unit}: {ml}ml" for unit, ml in HYDRATION_CONVERSIONS_ML.items())
+
 # Health Processing System Messages
 HEALTH_DETECTION_SYSTEM_MESSAGE = """You are a health data processing assistant. Your job is to detect and extract health-related information from user messages.
 
@@ -294,11 +440,7 @@ OUTPUT FORMAT (JSON ONLY):
 }
 
 HYDRATION CONVERSIONS:
-- glass: 250ml
-- cup: 200ml  
-- bottle: 500ml
-- sipper: 400ml
-- mug: 300ml
+""" + HYDRATION_CONVERSION_LINES + """
 - Any specific ml amounts mentioned
 
 MEAL ESTIMATION:
@@ -347,6 +489,16 @@ DELETE CONFIRMATIONS:
 
 Keep delete confirmations brief and factual."""
 
+# Career action plan system message
+CAREER_PLAN_SYSTEM_MESSAGE = """You are Donna, an elite career strategist like Donna Paulsen from Suits. You're sharp, strategic, and give actionable advice that gets results. 
+
+Create a precise 5-step action plan that's specific to the user's goal. Each step should be:
+1. Actionable and specific (not generic advice)
+2. Include strategic insights that most people miss
+3. Focus on leverage and smart positioning
+
+Format your response as exactly 5 numbered steps, each 2-3 sentences max. Be direct and strategic."""
+
 # Weekly Analytics Expert System Message
 WEEKLY_ANALYTICS_SYSTEM_MESSAGE = """You are a Harvard-trained physician and exercise physiologist with expertise in metabolic health, circadian biology, and nutritional biochemistry. Provide sophisticated weekly health analysis.
 
@@ -382,34 +534,282 @@ SOPHISTICATED INSIGHT EXAMPLES:
 
 AVOID: Oversimplified explanations, obvious observations, generic wellness advice."""
 
+# Timestamps are stored as native BSON dates (UTC). Rows written before that hold ISO
+# strings until the native_dates migrations rewrite them; while DATE_DUAL_READ is on,
+# time comparisons match both representations (Mongo never compares a string to a date).
+DATE_DUAL_READ = os.environ.get('DATE_DUAL_READ', 'true').lower() == 'true'
+
+def to_mongo_value(value):
+    """Datetimes at any depth become aware UTC datetimes, which pymongo stores as BSON dates"""
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, dict):
+        return {key: to_mongo_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_mongo_value(item) for item in value]
+    return value
+
 # Helper function to prepare data for MongoDB
 def prepare_for_mongo(data):
     if isinstance(data, dict):
         for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
+            data[key] = to_mongo_value(value)
     return data
 
+def time_condition(field: str, **bounds: datetime) -> Dict[str, Any]:
+    """Range condition on a timestamp field, e.g. time_condition("datetime_utc", gte=start, lt=end)"""
+    native = {f"${op}": to_mongo_value(value) for op, value in bounds.items()}
+    if not DATE_DUAL_READ:
+        return {field: native}
+    legacy = {op: value.isoformat() for op, value in native.items()}
+    return {"$or": [{field: native}, {field: legacy}]}
+
+def parse_stored_datetime(value) -> Optional[datetime]:
+    """A stored timestamp (BSON date or legacy ISO string) as an aware UTC datetime"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return None
+
+# Multi-document writes run in a transaction when the deployment supports it (replica
+# set or mongos); a standalone server falls back to plain sequential writes.
+transactions_supported: Optional[bool] = None
+
+async def run_transaction(operation):
+    """Run `await operation(session)` atomically if possible, else with session=None"""
+    global transactions_supported
+    if transactions_supported is not False:
+        try:
+            async with await client.start_session() as session:
+                result = await session.with_transaction(operation)
+            transactions_supported = True
+            return result
+        except OperationFailure as e:
+            # 20 = IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+            if e.code != 20:
+                raise
+            transactions_supported = False
+            logging.warning("MongoDB transactions unavailable (standalone server); using sequential writes")
+    return await operation(None)
+
+# =====================================
+# LLM DETECTOR RESULT CACHE
+# =====================================
+
+# Relative dates make a gift answer depend on today's date, so those messages skip the cache
+DATE_RELATIVE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|next|this|coming|last|weekend|week|month|year|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|in \d+ days?)\b"
+)
+
+def is_date_relative(message: str) -> bool:
+    return bool(DATE_RELATIVE_RE.search(message.lower()))
+
+class DetectorResultCache:
+    """Two-tier cache (in-process LRU in front of a Mongo collection) for detector results
+    
+    Keys are a hash of (system prompt, model, normalized text), so changing a prompt or
+    model naturally invalidates old entries.
+    """
+    
+    def __init__(self, collection, max_entries: int, ttl_seconds: int):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.entries: "OrderedDict[str, Tuple[datetime, Dict[str, Any]]]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+    
+    @staticmethod
+    def make_key(system_prompt: str, model: str, text: str) -> str:
+        normalized = re.sub(r"\s+", " ", text.strip().lower())
+        return hashlib.sha256("\x1f".join([system_prompt, model, normalized]).encode("utf-8")).hexdigest()
+    
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: datetime):
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        
+        entry = self.entries.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > now:
+                self.entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self.entries[key]
+        
+        try:
+            doc = await self.collection.find_one({"key": key, "expires_at": {"$gt": now}})
+        except Exception as e:
+            logging.error(f"Detector cache read error: {str(e)}")
+            doc = None
+        
+        if doc:
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            self._remember(key, doc["value"], expires_at)
+            self.stats["mongo_hits"] += 1
+            return doc["value"]
+        
+        self.stats["misses"] += 1
+        return None
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        now = datetime.now(timezone.utc)
+        expires_at = now + self.ttl
+        self._remember(key, value, expires_at)
+        
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {"value": value, "expires_at": expires_at, "created_at": now}},
+                upsert=True
+            )
+        except Exception as e:
+            logging.error(f"Detector cache write error: {str(e)}")
+    
+    def bypass(self):
+        self.stats["bypassed"] += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": int(self.ttl.total_seconds()),
+            "enabled": DETECTOR_CACHE_ENABLED
+        }
+
+detector_cache = DetectorResultCache(
+    db.llm_detector_cache,
+    max_entries=DETECTOR_CACHE_MAX_ENTRIES,
+    ttl_seconds=DETECTOR_CACHE_TTL_SECONDS
+)
+
+# Local fast path for unambiguous hydration and sleep logs. Anything it is not
+# sure about (other drinks, negations, questions, plans) goes to the LLM.
+FAST_PATH_QUANTITY_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5
+}
+
+FAST_PATH_REJECT_WORDS = re.compile(
+    r"\b(not|no|never|didn'?t|don'?t|haven'?t|won'?t|should|need|want|will|going|gonna|"
+    r"remind|tomorrow|tonight|schedule|undo|delete|remove|how|what|why|when)\b"
+)
+
+FAST_PATH_UNIT_PATTERN = "|".join(HYDRATION_CONVERSIONS_ML)
+
+FAST_PATH_CONTAINER_RE = re.compile(
+    r"^(?:i\s+)?(?:just\s+)?(?:drank|had|finished)\s+"
+    r"(?P<quantity>\d+|" + "|".join(FAST_PATH_QUANTITY_WORDS) + r")\s+"
+    r"(?:full\s+|big\s+|large\s+)?(?P<unit>" + FAST_PATH_UNIT_PATTERN + r")(?:e?s)?"
+    r"(?:\s+of\s+water)?$"
+)
+
+FAST_PATH_ML_RE = re.compile(
+    r"^(?:i\s+)?(?:just\s+)?(?:drank|had|finished)\s+(?P<ml>\d{2,4})\s*ml(?:\s+of\s+water)?$"
+)
+
+FAST_PATH_SLEEP_RE = re.compile(
+    r"^(?:i\s+)?(?:slept|got)\s+(?:for\s+)?(?:about\s+)?(?P<hours>\d{1,2}(?:\.\d+)?)\s*"
+    r"(?:hours?|hrs?|h)(?:\s+of\s+sleep)?(?:\s+last\s+night)?$"
+)
+
+def parse_health_fast_path(message: str) -> Optional[HealthProcessingResult]:
+    """Deterministically parse obvious hydration/sleep logs; None means ask the LLM"""
+    text = re.sub(r"\s+", " ", message.lower()).strip().rstrip(".!")
+    if not text or "?" in text or FAST_PATH_REJECT_WORDS.search(text):
+        return None
+    
+    container_match = FAST_PATH_CONTAINER_RE.match(text)
+    if container_match:
+        quantity_text = container_match.group("quantity")
+        quantity = int(quantity_text) if quantity_text.isdigit() else FAST_PATH_QUANTITY_WORDS[quantity_text]
+        unit = container_match.group("unit")
+        if not 0 < quantity <= 8:
+            return None
+        unit_label = unit if quantity == 1 else unit + ("es" if unit.endswith("s") else "s")
+        return HealthProcessingResult(
+            detected=True,
+            message_type="hydration",
+            hydration_ml=quantity * HYDRATION_CONVERSIONS_ML[unit],
+            description=f"{quantity} {unit_label} of water",
+            confidence=0.95,
+            source="rules"
+        )
+    
+    ml_match = FAST_PATH_ML_RE.match(text)
+    if ml_match:
+        hydration_ml = int(ml_match.group("ml"))
+        if not 0 < hydration_ml <= 2000:
+            return None
+        return HealthProcessingResult(
+            detected=True,
+            message_type="hydration",
+            hydration_ml=hydration_ml,
+            description=f"{hydration_ml}ml of water",
+            confidence=0.95,
+            source="rules"
+        )
+    
+    sleep_match = FAST_PATH_SLEEP_RE.match(text)
+    if sleep_match:
+        sleep_hours = float(sleep_match.group("hours"))
+        if not 0 < sleep_hours <= 16:
+            return None
+        return HealthProcessingResult(
+            detected=True,
+            message_type="sleep",
+            sleep_hours=sleep_hours,
+            description=f"Slept {sleep_hours:g} hours",
+            confidence=0.95,
+            source="rules"
+        )
+    
+    return None
+
 # Health Processing Functions
-async def process_health_message(message: str) -> HealthProcessingResult:
-    """Process message to detect and extract health data using LLM"""
+async def process_health_message(message: str, strict: bool = False) -> HealthProcessingResult:
+    """Process message to detect and extract health data using LLM
+    
+    Model errors and unparseable replies come back as "not detected" so a chat turn carries
+    on; with strict=True they raise instead, for callers that would store the answer.
+    """
+    fast_result = parse_health_fast_path(message)
+    if fast_result:
+        return fast_result
+    
+    cache_key = DetectorResultCache.make_key(HEALTH_DETECTION_SYSTEM_MESSAGE, LLM_MODEL, message)
+    if DETECTOR_CACHE_ENABLED:
+        cached = await detector_cache.get(cache_key)
+        if cached:
+            return HealthProcessingResult(**cached)
+    
     try:
         # Use LLM to detect and extract health information
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id="health_processing",
-            system_message=HEALTH_DETECTION_SYSTEM_MESSAGE
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_msg = UserMessage(text=message)
-        llm_response = await chat.send_message(user_msg)
+        llm_response = await llm_gateway.complete("health_detection", message)
         
         # Parse JSON response
-        import json
         try:
             health_data = json.loads(llm_response.strip())
-            return HealthProcessingResult(**health_data)
+            result = HealthProcessingResult(**health_data)
         except json.JSONDecodeError:
+            if strict:
+                raise
             # Fallback if JSON parsing fails
             return HealthProcessingResult(
                 detected=False,
@@ -417,7 +817,16 @@ async def process_health_message(message: str) -> HealthProcessingResult:
                 description="Processing failed",
                 confidence=0.0
             )
+        
+        if DETECTOR_CACHE_ENABLED:
+            await detector_cache.set(cache_key, result.dict())
+        return result
+    except LlmOverloadedError:
+        # No capacity: fail the turn with 429 rather than misroute the message as "not detected"
+        raise
     except Exception as e:
+        if strict:
+            raise
         logging.error(f"Health processing error: {str(e)}")
         return HealthProcessingResult(
             detected=False,
@@ -503,20 +912,134 @@ async def update_daily_health_stats(session_id: str, health_result: HealthProces
             type=health_result.message_type,
             description=health_result.description,
             value=str(health_result.hydration_ml or health_result.calories or health_result.sleep_hours or ""),
+            calories=health_result.calories if health_result.message_type == "meal" else None,
+            protein=health_result.protein if health_result.message_type == "meal" else None,
             session_id=session_id,  # Include session_id
             datetime_utc=datetime.now(timezone.utc)
         )
         await db.health_entries.insert_one(prepare_for_mongo(entry.dict()))
 
+# Confirmation variant pools, following HEALTH_CONFIRMATION_SYSTEM_MESSAGE's rules. Placeholders:
+# {hydration_ml}, {calories}, {protein}, {sleep_hours} and {description} (the detector's summary)
+HEALTH_CONFIRMATION_TEMPLATES: Dict[str, List[str]] = {
+    "hydration": [
+        "{hydration_ml}ml noted. Your hydration's looking good — keep it consistent.",
+        "Got it, {hydration_ml}ml logged. Keep sipping steadily through the day.",
+        "{hydration_ml}ml in. Nice — consistency is what counts with water.",
+    ],
+    "meal": [  # Always calories and protein
+        "Great choice! Logged your meal - {calories} calories and {protein}g protein.",
+        "Meal logged: {calories} calories and {protein}g protein. Nicely done.",
+        "Got it — {calories} calories and {protein}g protein added to today.",
+    ],
+    "meal_balance_tip": [  # Occasionally appended after heavy meals, never every time
+        "A lighter, fiber-rich option next meal will keep things balanced.",
+        "Maybe keep the next one lighter — some greens will balance the day out.",
+    ],
+    "sleep_rested": [  # 7+ hours
+        "Your {sleep_hours:g} hours have been logged! Your body will thank you for that.",
+        "{sleep_hours:g} hours of sleep logged. That's the kind of night that pays off all day.",
+        "Logged {sleep_hours:g} hours. Well rested looks good on you.",
+    ],
+    "sleep_short": [  # Under 7 hours
+        "{sleep_hours:g} hours logged. Try to turn in earlier tonight or slip in a midday nap.",
+        "{sleep_hours:g} hours noted. An earlier night tonight would do you good.",
+        "Logged {sleep_hours:g} hours. If you can, grab a short nap to make up for it.",
+    ],
+    "default": [
+        "Health data logged successfully.",
+    ],
+}
+
+HEALTH_CONFIRMATION_SAMPLE = {"hydration_ml": 250, "calories": 500, "protein": 30, "sleep_hours": 7.5, "description": "sample"}
+
+def health_confirmation_variant_error(variant: Any) -> Optional[str]:
+    """Why a template variant is unusable, or None if it is fine
+    
+    Only the plain placeholders in HEALTH_CONFIRMATION_SAMPLE are allowed - attribute and
+    index lookups ({description.upper}, {calories[0]}) would render reprs or fail at send time.
+    """
+    if not isinstance(variant, str):
+        return "not a string"
+    try:
+        for _, field, _, _ in string.Formatter().parse(variant):
+            if field is not None and field not in HEALTH_CONFIRMATION_SAMPLE:
+                return f"unsupported placeholder {{{field}}}"
+        variant.format(**HEALTH_CONFIRMATION_SAMPLE)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+def load_health_confirmation_templates(path: Optional[str]) -> Dict[str, List[str]]:
+    """Built-in pools, with any pool named in the JSON file at `path` replaced
+    
+    Variants that don't format with sample values are dropped (and logged); a pool left
+    empty keeps its built-in variants, and a file that can't be read or isn't a JSON object
+    is ignored, so a bad file can't break confirmations.
+    """
+    templates = {pool: list(variants) for pool, variants in HEALTH_CONFIRMATION_TEMPLATES.items()}
+    if not path:
+        return templates
+    try:
+        overrides = json.loads(Path(path).read_text())
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not load health confirmation templates from {path}: {str(e)}")
+        return templates
+    if not isinstance(overrides, dict):
+        logging.error(f"Health confirmation templates in {path} must be a JSON object of pools, using the built-ins")
+        return templates
+    
+    for pool, variants in overrides.items():
+        if pool not in templates:
+            logging.warning(f"Unknown health confirmation pool '{pool}' in {path}")
+            continue
+        if not isinstance(variants, list):
+            logging.warning(f"Health confirmation pool '{pool}' in {path} is not a list, keeping the built-ins")
+            continue
+        valid = []
+        for variant in variants:
+            error = health_confirmation_variant_error(variant)
+            if error:
+                logging.warning(f"Skipping health confirmation variant {variant!r}: {error}")
+            else:
+                valid.append(variant)
+        if valid:
+            templates[pool] = valid
+    return templates
+
+health_confirmation_templates = load_health_confirmation_templates(HEALTH_CONFIRMATION_TEMPLATES_PATH)
+
+def format_health_confirmation(health_result: HealthProcessingResult, rng: random.Random = random) -> str:
+    """Templated confirmation - User's exact specifications, phrased from a random variant"""
+    values = {
+        "hydration_ml": health_result.hydration_ml or 0,
+        "calories": health_result.calories or 0,
+        "protein": health_result.protein or 0,
+        "sleep_hours": health_result.sleep_hours or 0,
+        "description": health_result.description,
+    }
+    if health_result.message_type == "hydration":
+        pool = "hydration"
+    elif health_result.message_type == "meal":
+        pool = "meal"
+    elif health_result.message_type == "sleep":
+        pool = "sleep_rested" if values["sleep_hours"] >= 7 else "sleep_short"
+    else:
+        pool = "default"
+    
+    confirmation = rng.choice(health_confirmation_templates[pool]).format(**values)
+    if (pool == "meal" and values["calories"] >= HEALTH_HEAVY_MEAL_CALORIES and
+            rng.random() < HEALTH_BALANCE_TIP_CHANCE):
+        confirmation += " " + rng.choice(health_confirmation_templates["meal_balance_tip"])
+    return confirmation
+
 async def generate_health_confirmation(health_result: HealthProcessingResult) -> str:
     """Generate a confirmation message using Donna's personality"""
+    if health_result.source == "rules" or HEALTH_CONFIRMATION_MODE != "llm":
+        # Answered from the templates, no second LLM round trip
+        return format_health_confirmation(health_result)
+    
     try:
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id="health_confirmation",
-            system_message=HEALTH_CONFIRMATION_SYSTEM_MESSAGE
-        ).with_model("openai", "gpt-4o-mini")
-        
         # Create context message for Donna
         context_parts = []
         if health_result.message_type == "hydration":
@@ -527,21 +1050,10 @@ async def generate_health_confirmation(health_result: HealthProcessingResult) ->
             context_parts.append(f"Logged {health_result.sleep_hours} hours sleep")
             
         context = f"Health logged: {', '.join(context_parts)}. Description: {health_result.description}"
-        user_msg = UserMessage(text=context)
-        
-        return await chat.send_message(user_msg)
+        return await llm_gateway.complete("health_confirmation", context)
     except Exception:
-        # Fallback confirmation - User's exact specifications
-        if health_result.message_type == "hydration":
-            return f"{health_result.hydration_ml}ml noted. Your hydration's looking good — keep it consistent."
-        elif health_result.message_type == "meal":
-            return f"Great choice! Logged your meal - {health_result.calories} calories and {health_result.protein}g protein."
-        elif health_result.message_type == "sleep":
-            if health_result.sleep_hours >= 7:
-                return f"Your {health_result.sleep_hours} hours have been logged! Your body will thank you for that."
-            else:
-                return f"{health_result.sleep_hours} hours logged. Try to turn in earlier tonight or slip in a midday nap."
-        return "Health data logged successfully."
+        # Fallback confirmation
+        return format_health_confirmation(health_result)
 
 async def handle_health_delete_command(session_id: str, health_result: HealthProcessingResult) -> str:
     """Handle delete/undo commands for health entries"""
@@ -551,16 +1063,13 @@ async def handle_health_delete_command(session_id: str, health_result: HealthPro
         if delete_type == "last":
             # Find and delete the most recent health entry of any type for this session
             today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-            start_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc).isoformat()
-            end_of_day = (datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)).isoformat()
+            start_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            end_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
             
             recent_entry = await db.health_entries.find_one(
                 {
                     "session_id": session_id,
-                    "datetime_utc": {
-                        "$gte": start_of_day,
-                        "$lt": end_of_day
-                    }
+                    **time_condition("datetime_utc", gte=start_of_day, lt=end_of_day)
                 },
                 sort=[("datetime_utc", -1)]
             )
@@ -578,17 +1087,14 @@ async def handle_health_delete_command(session_id: str, health_result: HealthPro
         try:
             # Manually call the undo logic
             today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-            start_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc).isoformat()
-            end_of_day = (datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)).isoformat()
+            start_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            end_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
             
             recent_entry = await db.health_entries.find_one(
                 {
                     "type": delete_type,
                     "session_id": session_id,
-                    "datetime_utc": {
-                        "$gte": start_of_day,
-                        "$lt": end_of_day
-                    }
+                    **time_condition("datetime_utc", gte=start_of_day, lt=end_of_day)
                 },
                 sort=[("datetime_utc", -1)]
             )
@@ -612,7 +1118,7 @@ async def handle_health_delete_command(session_id: str, health_result: HealthPro
                     )
                     
             elif delete_type == "meal":
-                await recalculate_meal_stats(session_id, today)
+                await remove_meal_from_stats(session_id, today, entry_data)
                 
             elif delete_type == "sleep":
                 await db.daily_health_stats.update_one(
@@ -668,6 +1174,12 @@ class NotificationPayload(BaseModel):
     type: Optional[str] = "general"  # "reminder", "health", "general"
     actions: Optional[List[Dict[str, str]]] = None
 
+class PushDeliveryOutcome(BaseModel):
+    status: str  # "sent", "gone", "retryable", "failed", "no_subscription"
+    endpoint: Optional[str] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
 class ScheduledNotification(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     session_id: str
@@ -676,10 +1188,43 @@ class ScheduledNotification(BaseModel):
     body: str
     scheduled_time: datetime
     notification_type: str  # "reminder", "health_report", "general"
+    reminder_offset_hours: Optional[int] = None  # Event reminders: which REMINDER_POLICIES entry
     sent: bool = False
+    status: str = "pending"  # "pending", "in_flight", "delivered", "retry_scheduled", "skipped", "dead"
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None  # When the dispatcher should next pick it up
+    last_error: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     sent_at: Optional[datetime] = None
 
+    @validator('scheduled_time')
+    def normalize_scheduled_time(cls, v):
+        # Stored timestamps are UTC (legacy ISO strings only sort correctly in one offset)
+        if v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v.astimezone(timezone.utc)
+    
+    @validator('next_attempt_at', always=True)
+    def default_next_attempt(cls, v, values):
+        # A new notification is first due at its scheduled time
+        if v is None and values.get('status') == "pending":
+            return values.get('scheduled_time')
+        return v
+
+class NotificationDeadLetter(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    notification_id: str
+    session_id: str
+    title: str
+    body: str
+    notification_type: str
+    reason: str  # Final delivery status: "gone", "failed", "retryable" (attempts exhausted)
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    replayed_at: Optional[datetime] = None
+
 class ScheduledNotificationCreate(BaseModel):
     session_id: str
     event_id: Optional[str] = None
@@ -752,6 +1297,36 @@ def verify_password(password: str, hashed: str) -> bool:
     """Verify password against hash"""
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash")
+password_semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+password_work_metrics = {"waiting": 0, "in_flight": 0, "completed": 0, "peak_waiting": 0, "total_wait_ms": 0.0}
+
+async def run_password_work(func, *args):
+    """Run blocking bcrypt work on the password pool, tracking queue depth"""
+    metrics = password_work_metrics
+    metrics["waiting"] += 1
+    metrics["peak_waiting"] = max(metrics["peak_waiting"], metrics["waiting"])
+    queued_at = time.perf_counter()
+    try:
+        await password_semaphore.acquire()
+    finally:
+        metrics["waiting"] -= 1
+    
+    metrics["total_wait_ms"] += (time.perf_counter() - queued_at) * 1000
+    metrics["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        metrics["in_flight"] -= 1
+        metrics["completed"] += 1
+        password_semaphore.release()
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_work(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await run_password_work(verify_password, password, hashed)
+
 # Emergent Auth API endpoint
 EMERGENT_AUTH_API = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
 
@@ -807,6 +1382,7 @@ async def create_user_session(user: User, emergent_session_id: str, emergent_tok
         )
         
         await db.user_sessions.insert_one(prepare_for_mongo(session.dict()))
+        await session_user_cache.invalidate_token(session.session_token)
         logging.info(f"Created session for user: {user.email}")
         return session
         
@@ -814,6 +1390,71 @@ async def create_user_session(user: User, emergent_session_id: str, emergent_tok
         logging.error(f"Error creating session: {str(e)}")
         raise HTTPException(status_code=500, detail="Error creating session")
 
+class SessionUserCache:
+    """Bounded in-process cache from session token to User
+    
+    Positive entries live for at most SESSION_CACHE_TTL_SECONDS and never past the
+    session's own expires_at. Unknown or expired tokens are cached briefly as None so
+    repeated bad tokens do not hit Mongo. Logout invalidates its token. Nothing updates
+    a user document in place today; a path that does must drop that user's entries.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: int, negative_ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.negative_ttl = timedelta(seconds=negative_ttl_seconds)
+        self.entries: "OrderedDict[str, Tuple[datetime, Optional[User]]]" = OrderedDict()
+        self.lock = asyncio.Lock()
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0}
+    
+    async def get(self, token: str) -> Tuple[bool, Optional[User]]:
+        """Return (found, user); user is None for a cached unknown token"""
+        async with self.lock:
+            entry = self.entries.get(token)
+            if not entry:
+                self.stats["misses"] += 1
+                return False, None
+            
+            expires_at, user = entry
+            if expires_at <= datetime.now(timezone.utc):
+                del self.entries[token]
+                self.stats["misses"] += 1
+                return False, None
+            
+            self.entries.move_to_end(token)
+            self.stats["hits" if user else "negative_hits"] += 1
+            return True, user.copy() if user else None
+    
+    async def put(self, token: str, user: Optional[User], session_expires_at: Optional[datetime] = None):
+        now = datetime.now(timezone.utc)
+        expires_at = now + (self.ttl if user else self.negative_ttl)
+        if session_expires_at:
+            expires_at = min(expires_at, session_expires_at)
+        
+        async with self.lock:
+            self.entries[token] = (expires_at, user)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    async def invalidate_token(self, token: str):
+        async with self.lock:
+            if self.entries.pop(token, None):
+                self.stats["invalidations"] += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self.entries), "max_entries": self.max_entries}
+
+session_user_cache = SessionUserCache(
+    max_entries=SESSION_CACHE_MAX_ENTRIES,
+    ttl_seconds=SESSION_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=SESSION_CACHE_NEGATIVE_TTL_SECONDS
+)
+
+def parse_session_expiry(value) -> Optional[datetime]:
+    """Session expires_at as an aware UTC datetime (stored as a date or an ISO string)"""
+    return parse_stored_datetime(value)
+
 async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> Optional[User]:
     """Get current authenticated user from session token"""
     try:
@@ -827,21 +1468,29 @@ async def get_current_user(request: Request, credentials: HTTPAuthorizationCrede
         if not session_token:
             return None
         
+        found, cached_user = await session_user_cache.get(session_token)
+        if found:
+            return cached_user
+        
         # Find active session
         session = await db.user_sessions.find_one({
             "session_token": session_token,
-            "expires_at": {"$gt": datetime.now(timezone.utc)}
+            **time_condition("expires_at", gt=datetime.now(timezone.utc))
         })
         
         if not session:
+            await session_user_cache.put(session_token, None)
             return None
         
         # Get user
         user = await db.users.find_one({"id": session["user_id"]})
         if not user:
+            await session_user_cache.put(session_token, None)
             return None
         
-        return User(**user)
+        current_user = User(**user)
+        await session_user_cache.put(session_token, current_user, parse_session_expiry(session["expires_at"]))
+        return current_user
         
     except Exception as e:
         logging.error(f"Error getting current user: {str(e)}")
@@ -855,6 +1504,14 @@ async def require_auth(current_user: User = Depends(get_current_user)) -> User:
             detail="Authentication required",
             headers={"WWW-Authenticate": "Bearer"}
         )
+    # Model calls made while handling this request count against this user's LLM slots
+    llm_caller.set(current_user.id)
+    return current_user
+
+async def require_admin(current_user: User = Depends(require_auth)) -> User:
+    """Dependency to require an operator account listed in ADMIN_EMAILS"""
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
 # For backward compatibility with existing "default" session
@@ -876,13 +1533,7 @@ class GiftFlowResult(BaseModel):
     confidence: float = 0.0
     event_title: Optional[str] = None
 
-async def process_gift_message(message: str) -> GiftFlowResult:
-    """Detect birthday/anniversary occasions and extract relationship/date info"""
-    try:
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id="gift_detection",
-            system_message="""You are a gift occasion detector. Analyze messages for birthday or anniversary mentions.
+GIFT_DETECTION_SYSTEM_MESSAGE = """You are a gift occasion detector. Analyze messages for birthday or anniversary mentions.
 
 Extract these details:
 - occasion: "birthday" or "anniversary" 
@@ -903,20 +1554,223 @@ Examples:
 "It's my mom's birthday" → {"detected": true, "occasion": "birthday", "relationship": "mom", "date": "2025-09-06", "confidence": 0.9, "event_title": "Mom's Birthday"}
 "Our anniversary next Friday" → {"detected": true, "occasion": "anniversary", "relationship": "partner", "date": "2025-09-13", "confidence": 0.8, "event_title": "Anniversary"}
 "Kyle's birthday tomorrow" → {"detected": true, "occasion": "birthday", "relationship": "Kyle", "date": "2025-09-07", "confidence": 0.9, "event_title": "Kyle's Birthday"}"""
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_msg = UserMessage(text=f"Analyze this message: {message}")
-        response = await chat.send_message(user_msg)
+
+async def process_gift_message(message: str) -> GiftFlowResult:
+    """Detect birthday/anniversary occasions and extract relationship/date info"""
+    # Relative dates resolve against today, so neither read nor write the cache for them
+    use_cache = DETECTOR_CACHE_ENABLED and not is_date_relative(message)
+    cache_key = DetectorResultCache.make_key(GIFT_DETECTION_SYSTEM_MESSAGE, LLM_MODEL, message)
+    if use_cache:
+        cached = await detector_cache.get(cache_key)
+        if cached:
+            return GiftFlowResult(**cached)
+    elif DETECTOR_CACHE_ENABLED:
+        detector_cache.bypass()
+    
+    try:
+        response = await llm_gateway.complete("gift_detection", f"Analyze this message: {message}")
         
         # Parse JSON response
-        import json
         result_dict = json.loads(response.strip())
-        return GiftFlowResult(**result_dict)
+        result = GiftFlowResult(**result_dict)
+        
+        # Only negatives are cached: a detected occasion carries a date the model
+        # may have filled in from today
+        if use_cache and not result.detected:
+            await detector_cache.set(cache_key, result.dict())
+        return result
         
+    except LlmOverloadedError:
+        # No capacity: fail the turn with 429 rather than misroute the message as "not detected"
+        raise
     except Exception as e:
         logging.error(f"Gift detection error: {str(e)}")
         return GiftFlowResult(detected=False, confidence=0.0)
 
+# Single-call intent extraction (UNIFIED_INTENT_EXTRACTION)
+INTENT_EXTRACTION_SYSTEM_MESSAGE = """You are Donna's intent extractor. Classify one user message into ALL of the slots below in a single pass.
+
+SLOTS:
+1. health: logging hydration, meals or sleep
+2. delete: undoing/deleting health entries
+3. gift: birthday or anniversary mentions
+4. event: something the user wants on their calendar (meeting, appointment, reminder, plan with a date or time)
+
+OUTPUT FORMAT (JSON ONLY):
+{
+  "health": {"detected": true/false, "message_type": "hydration"/"meal"/"sleep"/"none", "hydration_ml": number, "calories": number, "protein": number, "sleep_hours": number, "description": "brief description", "confidence": 0.0-1.0},
+  "delete": {"detected": true/false, "delete_type": "hydration"/"meal"/"sleep"/"last", "description": "brief description", "confidence": 0.0-1.0},
+  "gift": {"detected": true/false, "occasion": "birthday"/"anniversary"/null, "relationship": "relationship_or_name", "date": "YYYY-MM-DD", "confidence": 0.0-1.0, "event_title": "Mom's Birthday"},
+  "event": {"detected": true/false, "title": "short title", "datetime_utc": "YYYY-MM-DDTHH:MM:00+00:00", "category": "work"/"appointments"/"regular_activities"/"personal"/"reminders", "confidence": 0.0-1.0}
+}
+
+HEALTH RULES:
+- Hydration: """ + ", ".join(f"{unit} {ml}ml" for unit, ml in HYDRATION_CONVERSIONS_ML.items()) + """, or any specific ml amount
+- Meals: estimate calories and protein (grams), e.g. sandwich 300-400 cal/15-20g, pasta 400-600 cal/12-15g, salad 150-300 cal/5-10g, pizza slice 250-300 cal/12-15g, burger 500-700 cal/25-30g
+- Sleep: "slept 8 hours" = 8.0, "slept at 10pm, woke at 6am" = 8.0
+
+DELETE RULES:
+- "delete last entry"/"refresh stats" → "last", "undo hydration" → "hydration", "remove last meal" → "meal", "undo sleep" → "sleep"
+
+GIFT RULES:
+- relationship: mom/mother/momma, dad/father/daddy/papa, wife, girlfriend, boss, colleague, friend, child/kid, uncle, aunt, or any proper name
+- Resolve relative dates ("next Friday", "tomorrow", "12 Oct") against the date given with the message
+
+EVENT RULES:
+- Resolve relative dates and times against the date given with the message; use 10:00 UTC if no time is given
+- Health logs and gift occasions are NOT events
+
+Set "detected": false for every slot that does not apply.
+
+IMPORTANT: Only return JSON. No additional text or explanations."""
+
+class EventCandidate(BaseModel):
+    detected: bool = False
+    title: Optional[str] = None
+    datetime_utc: Optional[str] = None  # ISO string in UTC
+    category: Optional[str] = None
+    confidence: float = 0.0
+
+class IntentExtractionResult(BaseModel):
+    health: HealthProcessingResult
+    gift: GiftFlowResult
+    event: EventCandidate
+
+class IntentComparisonRequest(BaseModel):
+    messages: List[str]
+
+def parse_intent_extraction(payload: Dict[str, Any]) -> IntentExtractionResult:
+    """Validate the extractor's JSON document into the existing detector result models"""
+    health_slot = payload.get("health") or {}
+    delete_slot = payload.get("delete") or {}
+    
+    if delete_slot.get("detected"):
+        health = HealthProcessingResult(
+            detected=True,
+            message_type="delete",
+            delete_type=delete_slot.get("delete_type") or "last",
+            description=delete_slot.get("description") or "Delete health entry",
+            confidence=delete_slot.get("confidence") or 0.0
+        )
+    else:
+        health = HealthProcessingResult(**{
+            **health_slot,
+            "detected": bool(health_slot.get("detected")),
+            "message_type": health_slot.get("message_type") or "none",
+            "description": health_slot.get("description") or "",
+            "confidence": health_slot.get("confidence") or 0.0
+        })
+    
+    gift_slot = payload.get("gift") or {}
+    gift = GiftFlowResult(**{**gift_slot, "detected": bool(gift_slot.get("detected")), "confidence": gift_slot.get("confidence") or 0.0})
+    
+    event_slot = payload.get("event") or {}
+    event = EventCandidate(**{**event_slot, "detected": bool(event_slot.get("detected")), "confidence": event_slot.get("confidence") or 0.0})
+    
+    return IntentExtractionResult(health=health, gift=gift, event=event)
+
+async def process_unified_intent(message: str) -> IntentExtractionResult:
+    """Extract health, delete, gift and event intents from a message with one LLM call"""
+    try:
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        response = await llm_gateway.complete("intent_extraction", f"Today is {today}. Analyze this message: {message}")
+        
+        return parse_intent_extraction(json.loads(response.strip()))
+        
+    except LlmOverloadedError:
+        # No capacity: fail the turn with 429 rather than misroute the message as "not detected"
+        raise
+    except Exception as e:
+        logging.error(f"Intent extraction error: {str(e)}")
+        return IntentExtractionResult(
+            health=HealthProcessingResult(
+                detected=False,
+                message_type="none",
+                description="Error processing",
+                confidence=0.0
+            ),
+            gift=GiftFlowResult(detected=False, confidence=0.0),
+            event=EventCandidate()
+        )
+
+class ChatIntents(BaseModel):
+    health: HealthProcessingResult
+    gift: Optional[GiftFlowResult] = None  # None when health already claimed the message
+    event: Optional[EventCandidate] = None  # Only set by the unified extractor
+
+def is_confident_health(health_result: HealthProcessingResult) -> bool:
+    return health_result.detected and health_result.confidence > HEALTH_CONFIDENCE_THRESHOLD
+
+def is_confident_gift(gift_result: Optional[GiftFlowResult]) -> bool:
+    return bool(gift_result and gift_result.detected and gift_result.confidence > GIFT_CONFIDENCE_THRESHOLD)
+
+def is_confident_event(event_candidate: Optional[EventCandidate]) -> bool:
+    return bool(event_candidate and event_candidate.detected and event_candidate.confidence > EVENT_CONFIDENCE_THRESHOLD)
+
+async def detect_chat_intents(message: str) -> ChatIntents:
+    """Run the health and gift detectors for a chat turn (health takes priority over gift)"""
+    # Obvious hydration/sleep logs never reach the LLM detectors
+    fast_result = parse_health_fast_path(message)
+    if fast_result:
+        return ChatIntents(health=fast_result)
+    
+    if UNIFIED_INTENT_EXTRACTION:
+        extracted = await process_unified_intent(message)
+        return ChatIntents(health=extracted.health, gift=extracted.gift, event=extracted.event)
+    
+    if not SPECULATIVE_DETECTION:
+        health_result = await process_health_message(message)
+        if is_confident_health(health_result):
+            return ChatIntents(health=health_result)
+        return ChatIntents(health=health_result, gift=await process_gift_message(message))
+
+    # Speculative mode: both detectors start at once, the gift call is dropped
+    # as soon as health claims the message
+    health_task = asyncio.create_task(process_health_message(message))
+    gift_task = asyncio.create_task(process_gift_message(message))
+    try:
+        health_result = await health_task
+        if is_confident_health(health_result):
+            return ChatIntents(health=health_result)
+        return ChatIntents(health=health_result, gift=await gift_task)
+    finally:
+        for task in (health_task, gift_task):
+            if not task.done():
+                task.cancel()
+
+def health_results_agree(legacy: HealthProcessingResult, unified: HealthProcessingResult) -> bool:
+    if not is_confident_health(legacy):
+        return not is_confident_health(unified)
+    return is_confident_health(unified) and legacy.message_type == unified.message_type
+
+async def compare_intent_detectors(message: str) -> Dict[str, Any]:
+    """Run the legacy detectors and the unified extractor side by side on one message"""
+    legacy_health, legacy_gift, unified = await asyncio.gather(
+        process_health_message(message),
+        process_gift_message(message),
+        process_unified_intent(message)
+    )
+    legacy_event = looks_like_event(message.lower())
+    
+    return {
+        "message": message,
+        "legacy": {
+            "health": legacy_health.dict(),
+            "gift": legacy_gift.dict(),
+            "event": legacy_event
+        },
+        "unified": unified.dict(),
+        "agreement": {
+            "health": health_results_agree(legacy_health, unified.health),
+            "gift": is_confident_gift(legacy_gift) == is_confident_gift(unified.gift),
+            "event": legacy_event == is_confident_event(unified.event)
+        }
+    }
+
+async def generate_donna_reply(session_id: str, text: str) -> str:
+    """Generate a conversational reply in Donna's voice"""
+    return await llm_gateway.complete("donna_reply", text, session_id=session_id)
+
 def get_user_timezone_region(session_id: str) -> str:
     """Get Amazon region based on user timezone (simplified for now)"""
     # For now, return default amazon.com
@@ -1011,24 +1865,22 @@ async def create_gift_event_with_reminders(session_id: str, gift_result: GiftFlo
             description=f"Gift suggestions shared in chat on {datetime.now(timezone.utc).strftime('%Y-%m-%d')}.",
             datetime_utc=event_date,
             category="personal",
-            reminder=True,  # This will add the default 12h and 2h reminders
+            reminder=True,
+            reminder_policy="gift",  # 7-day reminder on top of the default 12h and 2h ones
             session_id=session_id  # CRITICAL FIX: Add missing session_id
         )
         
-        result = await db.calendar_events.insert_one(prepare_for_mongo(event_obj.dict()))
-        event_id = result.inserted_id
+        await db.calendar_events.insert_one(prepare_for_mongo(event_obj.dict()))
         
-        # Add special 7-day reminder for gift events
-        seven_day_reminder = CalendarReminder(
-            event_id=str(event_id),
-            reminder_datetime=event_date - timedelta(days=7, hours=-10),  # 7 days before at 10 AM
+        await schedule_event_reminders(
             session_id=session_id,
-            message=f"Gift reminder: {gift_result.event_title} is in 7 days"
+            event_id=event_obj.id,
+            event_title=event_obj.title,
+            event_datetime=event_date,
+            is_gift_event=True
         )
         
-        await db.calendar_reminders.insert_one(prepare_for_mongo(seven_day_reminder.dict()))
-        
-        return str(event_id)
+        return event_obj.id
         
     except Exception as e:
         logging.error(f"Error creating gift event: {str(e)}")
@@ -1058,46 +1910,56 @@ async def generate_gift_response(gift_result: GiftFlowResult, amazon_region: str
         return f"Saved: {gift_result.event_title} on {gift_result.date}. Let me know if you'd like gift suggestions!"
 
 # Chat endpoints
-@api_router.post("/chat", response_model=ChatResponse)
-async def chat_with_donna(request: ChatRequest, current_user: User = Depends(require_auth)):
+async def store_chat_message(message: str, is_user: bool, session_id: str):
+    chat_message = ChatMessage(message=message, is_user=is_user, session_id=session_id)
+    await db.chat_messages.insert_one(prepare_for_mongo(chat_message.dict()))
+
+async def route_chat_message(message: str, session_id: str, speculate: bool = False) -> ChatTurn:
+    """Run the detectors and side effects for one chat message and decide how Donna answers
+    
+    Handlers with a fixed answer (health, gift, notes) return it as the response; plain
+    conversation and event confirmations return the prompt for Donna's reply instead, so
+    the caller can either generate it whole or stream it, plus a canned reply for when the
+    model is unavailable.
+    """
+    reply_task = None
     try:
-        # Store user message
-        user_message = ChatMessage(
-            message=request.message,
-            is_user=True,
-            session_id=current_user.id
-        )
-        await db.chat_messages.insert_one(prepare_for_mongo(user_message.dict()))
-        
         # Check if we're waiting for notes from a previous event creation
         context = await db.conversation_context.find_one(
-            {"session_id": current_user.id, "waiting_for_notes": True}
+            {"session_id": session_id, "waiting_for_notes": True}
         )
         
         donna_response = ""
+        reply_prompt = None
+        fallback_response = DONNA_FALLBACK_REPLY
         created_event_id = None
         
-        # PRIORITY CHECK: Check for health messages first, then events
-        health_result = await process_health_message(request.message)
+        if speculate and not context:
+            # Start the plain conversational reply alongside the detectors; it is
+            # only used if nothing else claims the message
+            reply_task = asyncio.create_task(generate_donna_reply(session_id, message))
+        
+        # PRIORITY CHECK: health > gift > notes > event > chat
+        intents = await detect_chat_intents(message)
+        health_result = intents.health
+        gift_result = intents.gift
         
-        if health_result.detected and health_result.confidence > 0.6:
+        if is_confident_health(health_result):
             # Process health data first - this takes priority over event creation
             if health_result.message_type == "delete":
                 # Handle delete/undo commands
-                donna_response = await handle_health_delete_command(current_user.id, health_result)
+                donna_response = await handle_health_delete_command(session_id, health_result)
             else:
                 # Normal health logging
-                await update_daily_health_stats(current_user.id, health_result)
+                await update_daily_health_stats(session_id, health_result)
                 donna_response = await generate_health_confirmation(health_result)
             
         else:
             # Check for birthday/anniversary gift flow if not a health message
-            gift_result = await process_gift_message(request.message)
-            
-            if gift_result.detected and gift_result.confidence > 0.7:
+            if is_confident_gift(gift_result):
                 # Process gift flow - create calendar event with special reminders
-                amazon_region = get_user_timezone_region(current_user.id)
-                created_event_id = await create_gift_event_with_reminders(current_user.id, gift_result)
+                amazon_region = get_user_timezone_region(session_id)
+                created_event_id = await create_gift_event_with_reminders(session_id, gift_result)
                 
                 if created_event_id:
                     # Generate gift response with suggestions - this takes priority
@@ -1111,7 +1973,7 @@ async def chat_with_donna(request: ChatRequest, current_user: User = Depends(req
                         )
                     
                     # Set up context for potential notes
-                    await setup_event_notes_context(current_user.id, created_event_id)
+                    await setup_event_notes_context(session_id, created_event_id)
                 else:
                     donna_response = f"I've noted {gift_result.event_title} for {gift_result.date}. Let me know if you'd like gift suggestions!"
             
@@ -1123,7 +1985,7 @@ async def chat_with_donna(request: ChatRequest, current_user: User = Depends(req
                     'tomorrow', 'today', 'next week', 'am', 'pm', 'at '
                 ]
                 
-                message_lower = request.message.lower()
+                message_lower = message.lower()
                 contains_scheduling = any(keyword in message_lower for keyword in scheduling_keywords)
                 
                 if contains_scheduling:
@@ -1134,10 +1996,10 @@ async def chat_with_donna(request: ChatRequest, current_user: User = Depends(req
                     )
                     
                     # Process as new event (recursive call to handle properly)
-                    return await chat_with_donna(request, current_user)
+                    return await route_chat_message(message, session_id)
                 else:
                     # User is responding with notes for previous event
-                    await handle_event_notes_response(request.message, context, current_user.id)
+                    await handle_event_notes_response(message, context, session_id)
                     donna_response = "Perfect! I've added those notes to your event. You're all set!"
                     
                     # Clear the context
@@ -1147,7 +2009,7 @@ async def chat_with_donna(request: ChatRequest, current_user: User = Depends(req
                     )
             else:
                 # Check for regular event creation if not a gift message
-                created_event_id = await process_message_context(request.message, current_user.id)
+                created_event_id = await process_message_context(message, session_id, intents.event)
                 
                 if created_event_id:
                     # New event detected - clear any waiting notes context and create event
@@ -1157,29 +2019,21 @@ async def chat_with_donna(request: ChatRequest, current_user: User = Depends(req
                             {"$set": {"waiting_for_notes": False}}
                         )
                     
-                    # Initialize Donna chat for event creation response
-                    chat = LlmChat(
-                        api_key=openai_api_key,
-                        session_id=current_user.id,
-                        system_message=DONNA_SYSTEM_MESSAGE
-                    ).with_model("openai", "gpt-4o-mini")
-                    
-                    user_text = request.message + f"\n\n[CRITICAL INSTRUCTION: I have ALREADY automatically created the calendar event with reminders. DO NOT ask 'Would you like any reminders or notes?' - the event is ALREADY created and configured. Instead, say something like: 'Perfect! I've created your meeting for tomorrow at 7 PM with reminders set for 12 hours and 2 hours before. You're all set!' BE CONFIDENT AND DEFINITIVE, NOT ASKING PERMISSION.]"
-                    user_msg = UserMessage(text=user_text)
-                    
-                    donna_response = await chat.send_message(user_msg)
+                    # Donna's response for event creation
+                    reply_prompt = message + f"\n\n[CRITICAL INSTRUCTION: I have ALREADY automatically created the calendar event with reminders. DO NOT ask 'Would you like any reminders or notes?' - the event is ALREADY created and configured. Instead, say something like: 'Perfect! I've created your meeting for tomorrow at 7 PM with reminders set for 12 hours and 2 hours before. You're all set!' BE CONFIDENT AND DEFINITIVE, NOT ASKING PERMISSION.]"
+                    fallback_response = EVENT_CREATED_FALLBACK_REPLY
                     
                     # Set up context for potential notes
-                    await setup_event_notes_context(current_user.id, created_event_id)
+                    await setup_event_notes_context(session_id, created_event_id)
                 else:
                     # Check if this is a simple yes/no response to a previous question
-                    message_lower = request.message.lower().strip()
+                    message_lower = message.lower().strip()
                     is_simple_response = message_lower in ['yes', 'yeah', 'yep', 'sure', 'ok', 'okay', 'no', 'nope', 'no thanks']
                     
                     if is_simple_response:
                         # Get recent chat history to understand context
                         recent_messages = await db.chat_messages.find(
-                            {"session_id": current_user.id}
+                            {"session_id": session_id}
                         ).sort("timestamp", -1).limit(3).to_list(length=3)
                         
                         recent_context = ""
@@ -1188,54 +2042,176 @@ async def chat_with_donna(request: ChatRequest, current_user: User = Depends(req
                             recent_context += f"{role}: {msg['message']}\n"
                         
                         # Normal conversation flow with recent context for better continuity
-                        chat = LlmChat(
-                            api_key=openai_api_key,
-                            session_id=current_user.id,
-                            system_message=DONNA_SYSTEM_MESSAGE
-                        ).with_model("openai", "gpt-4o-mini")
-                        
-                        user_text = f"[RECENT CONVERSATION CONTEXT for continuity:\n{recent_context}]\n\nUser's current response: {request.message}\n\n[INSTRUCTION: The user is responding to your previous message. Understand the context and respond appropriately, maintaining conversation continuity.]"
-                        user_msg = UserMessage(text=user_text)
-                        donna_response = await chat.send_message(user_msg)
+                        reply_prompt = f"[RECENT CONVERSATION CONTEXT for continuity:\n{recent_context}]\n\nUser's current response: {message}\n\n[INSTRUCTION: The user is responding to your previous message. Understand the context and respond appropriately, maintaining conversation continuity.]"
+                    elif reply_task:
+                        # Normal conversation flow - the speculative reply already answers it
+                        try:
+                            donna_response = await reply_task
+                        except (LlmUnavailableError, asyncio.TimeoutError):
+                            donna_response = DONNA_FALLBACK_REPLY
                     else:
                         # Normal conversation flow - no event created, not waiting for notes
-                        chat = LlmChat(
-                            api_key=openai_api_key,
-                            session_id=current_user.id,
-                            system_message=DONNA_SYSTEM_MESSAGE
-                        ).with_model("openai", "gpt-4o-mini")
-                        
-                        user_msg = UserMessage(text=request.message)
-                        donna_response = await chat.send_message(user_msg)
+                        reply_prompt = message
+        
+        return ChatTurn(response=donna_response, reply_prompt=reply_prompt, fallback_response=fallback_response)
+    finally:
+        if reply_task and not reply_task.done():
+            reply_task.cancel()
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Per-turn latency of the chat endpoints; time to first token is the one users feel
+chat_latency_metrics = {
+    mode: {"turns": 0, "errors": 0, "rejected": 0, "first_token_ms": 0.0, "total_ms": 0.0}
+    for mode in ("json", "stream")
+}
+
+def record_chat_latency(mode: str, started: float, first_token_at: float):
+    metrics = chat_latency_metrics[mode]
+    metrics["turns"] += 1
+    metrics["first_token_ms"] += (first_token_at - started) * 1000
+    metrics["total_ms"] += (time.perf_counter() - started) * 1000
+
+async def generate_turn_reply(session_id: str, turn: ChatTurn) -> str:
+    """Donna's reply for a routed turn, or its canned fallback when the model is out of reach"""
+    try:
+        return await generate_donna_reply(session_id, turn.reply_prompt)
+    except (LlmUnavailableError, asyncio.TimeoutError) as e:
+        logging.warning(f"Chat reply fell back to template: {type(e).__name__}")
+        return turn.fallback_response
+
+@api_router.post("/chat", response_model=ChatResponse)
+async def chat_with_donna(request: ChatRequest, current_user: User = Depends(require_auth)):
+    started = time.perf_counter()
+    start_llm_budget(LLM_CHAT_BUDGET_SECONDS)
+    try:
+        await store_chat_message(request.message, True, current_user.id)
+        turn = await route_chat_message(request.message, current_user.id, speculate=SPECULATIVE_REPLY)
+        donna_response = turn.response
+        if turn.reply_prompt is not None:
+            donna_response = await generate_turn_reply(current_user.id, turn)
         
         # Store Donna's response
-        donna_message = ChatMessage(
-            message=donna_response,
-            is_user=False,
-            session_id=current_user.id
-        )
-        await db.chat_messages.insert_one(prepare_for_mongo(donna_message.dict()))
+        await store_chat_message(donna_response, False, current_user.id)
         
+        # Nothing reaches the client before the whole reply, so first token = total
+        record_chat_latency("json", started, time.perf_counter())
         return ChatResponse(response=donna_response, session_id=current_user.id)
     
+    except LlmOverloadedError as e:
+        chat_latency_metrics["json"]["rejected"] += 1
+        raise llm_overloaded_exception(e)
     except Exception as e:
+        chat_latency_metrics["json"]["errors"] += 1
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+@api_router.post("/chat/stream")
+async def stream_chat_with_donna(request: ChatRequest, http_request: Request, current_user: User = Depends(require_auth)):
+    """Same turn as POST /chat, with Donna's reply sent as Server-Sent Events while it is generated
+    
+    Events: "token" ({"text"}) per chunk, then "done" ({"response", "session_id"}) once the
+    reply is stored, or "error" ({"detail"}). Clients that don't accept text/event-stream
+    get the plain ChatResponse JSON of POST /chat.
+    """
+    if "text/event-stream" not in http_request.headers.get("accept", ""):
+        return await chat_with_donna(request, current_user)
+    
+    async def reply_chunks(turn: ChatTurn) -> AsyncIterator[str]:
+        if turn.reply_prompt is None:
+            yield turn.response
+            return
+        streamed = False
+        try:
+            async for chunk in llm_gateway.stream("donna_reply", turn.reply_prompt, session_id=current_user.id):
+                streamed = True
+                yield chunk
+        except (LlmUnavailableError, asyncio.TimeoutError) as e:
+            # Out of budget mid-reply: keep what was said; nothing said yet: the canned reply
+            logging.warning(f"Chat stream fell back to template: {type(e).__name__}")
+            if not streamed:
+                yield turn.fallback_response
+    
+    started = time.perf_counter()
+    start_llm_budget(LLM_CHAT_BUDGET_SECONDS)
+    try:
+        await store_chat_message(request.message, True, current_user.id)
+        # No speculative reply here: streaming it after the detectors is what cuts first-token time
+        turn = await route_chat_message(request.message, current_user.id)
+        # Wait for the first chunk before answering, so a turn without model capacity still
+        # gets a real 429 instead of an error event inside a 200 stream
+        chunks = reply_chunks(turn)
+        first_chunk = await anext(chunks, "")
+    except LlmOverloadedError as e:
+        chat_latency_metrics["stream"]["rejected"] += 1
+        raise llm_overloaded_exception(e)
+    except Exception as e:
+        chat_latency_metrics["stream"]["errors"] += 1
+        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+    first_token_at = time.perf_counter()
+    
+    async def events() -> AsyncIterator[str]:
+        reply = [first_chunk]
+        try:
+            yield sse_event("token", {"text": first_chunk})
+            async for chunk in chunks:
+                reply.append(chunk)
+                yield sse_event("token", {"text": chunk})
+            
+            # Stored once the reply is complete; a dropped client leaves no half message
+            donna_response = "".join(reply)
+            await store_chat_message(donna_response, False, current_user.id)
+            record_chat_latency("stream", started, first_token_at)
+            yield sse_event("done", {"response": donna_response, "session_id": current_user.id})
+        except Exception as e:
+            logging.error(f"Chat stream error: {str(e)}")
+            chat_latency_metrics["stream"]["errors"] += 1
+            yield sse_event("error", {"detail": f"Chat error: {str(e)}"})
+        finally:
+            await chunks.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/chat/history", response_model=List[ChatMessage])
 async def get_chat_history(current_user: User = Depends(require_auth)):
     messages = await db.chat_messages.find({"session_id": current_user.id}).sort("timestamp", 1).to_list(100)
     return [ChatMessage(**msg) for msg in messages]
 
+@api_router.post("/admin/intent/compare")
+async def compare_intent_extraction(comparison: IntentComparisonRequest, current_user: User = Depends(require_admin)):
+    """Compare the unified intent extractor against the legacy detectors, message by message
+    
+    Operators only: each message costs up to three sequential model calls.
+    """
+    results = [await compare_intent_detectors(message) for message in comparison.messages[:50]]
+    
+    return {
+        "total": len(results),
+        "agreement": {
+            slot: sum(1 for result in results if result["agreement"][slot])
+            for slot in ("health", "gift", "event")
+        },
+        "results": results
+    }
+
 # Calendar endpoints
-@api_router.post("/calendar/events", response_model=CalendarEvent)
-async def create_event(event: CalendarEventCreate, current_user: User = Depends(require_auth)):
+def parse_event_datetime(value: str) -> datetime:
     # Parse UTC datetime from frontend
     try:
-        datetime_utc = datetime.fromisoformat(event.datetime_utc.replace('Z', '+00:00'))
+        datetime_utc = datetime.fromisoformat(value.replace('Z', '+00:00'))
         if datetime_utc.tzinfo is None:
             datetime_utc = datetime_utc.replace(tzinfo=timezone.utc)
+        return datetime_utc.astimezone(timezone.utc)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format. Use ISO format.")
+
+@api_router.post("/calendar/events", response_model=CalendarEvent)
+async def create_event(event: CalendarEventCreate, current_user: User = Depends(require_auth)):
+    datetime_utc = parse_event_datetime(event.datetime_utc)
     
     event_obj = CalendarEvent(
         title=event.title,
@@ -1245,14 +2221,13 @@ async def create_event(event: CalendarEventCreate, current_user: User = Depends(
         reminder=event.reminder,
         session_id=current_user.id
     )
-    result = await db.calendar_events.insert_one(prepare_for_mongo(event_obj.dict()))
-    event_id = str(result.inserted_id)
+    await db.calendar_events.insert_one(prepare_for_mongo(event_obj.dict()))
     
     # Schedule push notification reminders if reminders are enabled
     if event.reminder:
         await schedule_event_reminders(
             session_id=current_user.id,
-            event_id=event_id,
+            event_id=event_obj.id,
             event_title=event.title,
             event_datetime=datetime_utc,
             is_gift_event=False
@@ -1260,41 +2235,161 @@ async def create_event(event: CalendarEventCreate, current_user: User = Depends(
     
     return event_obj
 
-@api_router.get("/calendar/events", response_model=List[CalendarEvent])
-async def get_events(current_user: User = Depends(require_auth)):
-    # Fetch user's events and sort by datetime_utc in ascending order (earliest first)
-    events = await db.calendar_events.find({"session_id": current_user.id}).sort("datetime_utc", 1).to_list(100)
-    result = []
+@api_router.post("/calendar/events/bulk", response_model=List[CalendarEvent])
+async def import_events(events: List[CalendarEventCreate], current_user: User = Depends(require_auth)):
+    """Create many events at once, scheduling all their reminders in bulk"""
+    if len(events) > CALENDAR_IMPORT_MAX_EVENTS:
+        raise HTTPException(status_code=400, detail=f"At most {CALENDAR_IMPORT_MAX_EVENTS} events per import")
+    if not events:
+        return []
+    
+    event_objs = [
+        CalendarEvent(
+            title=event.title,
+            description=event.description,
+            datetime_utc=parse_event_datetime(event.datetime_utc),
+            category=event.category or "personal",
+            reminder=event.reminder,
+            session_id=current_user.id
+        )
+        for event in events
+    ]
+    await db.calendar_events.insert_many([prepare_for_mongo(event_obj.dict()) for event_obj in event_objs])
+    
+    scheduled = await schedule_reminders_for_events(event_objs)
+    logging.info(f"Imported {len(event_objs)} events with {scheduled} reminders for user {current_user.id}")
+    return event_objs
+
+def encode_event_cursor(event: Dict[str, Any]) -> str:
+    value = event["datetime_utc"]
+    # Remember whether the row held a date or a legacy string: Mongo sorts all strings before all dates
+    position = {"t": value if isinstance(value, str) else value.isoformat(), "d": isinstance(value, datetime), "id": event["id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_event_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value = datetime.fromisoformat(position["t"]) if position.get("d") else str(position["t"])
+        return {"t": value, "id": str(position["id"])}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def events_after_cursor(position: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyset condition: everything sorting after (datetime_utc, id)"""
+    conditions = [
+        {"datetime_utc": {"$gt": position["t"]}},
+        {"datetime_utc": position["t"], "id": {"$gt": position["id"]}}
+    ]
+    if isinstance(position["t"], str):
+        # Past the legacy string rows, every native date row still follows
+        conditions.append({"datetime_utc": {"$type": "date"}})
+    return {"$or": conditions}
+
+async def resolve_user_timezone(session_id: str, tz: Optional[str]) -> ZoneInfo:
+    """The requested timezone, else the one in the user's settings, else UTC"""
+    if not tz:
+        settings = await db.user_settings.find_one({"session_id": session_id}, {"timezone": 1})
+        tz = (settings or {}).get("timezone") or "UTC"
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}")
+
+def calendar_view_window(view: str, anchor: Optional[str], zone: ZoneInfo) -> Tuple[datetime, datetime]:
+    """UTC bounds of the local day, week (Monday-Sunday) or month containing the anchor date"""
+    try:
+        day = datetime.strptime(anchor, '%Y-%m-%d').date() if anchor else datetime.now(zone).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+    
+    if view == "day":
+        start = day
+        end = start + timedelta(days=1)
+    elif view == "week":
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    else:
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    
+    # Local midnights, so DST changes and non-UTC offsets land on the right day
+    local_start = datetime(start.year, start.month, start.day, tzinfo=zone)
+    local_end = datetime(end.year, end.month, end.day, tzinfo=zone)
+    return local_start.astimezone(timezone.utc), local_end.astimezone(timezone.utc)
+
+@api_router.get("/calendar/events", response_model=List[CalendarEventView], response_model_exclude_unset=True)
+async def get_events(
+    response: Response,
+    limit: int = Query(CALENDAR_PAGE_DEFAULT_LIMIT, ge=1, le=CALENDAR_PAGE_MAX_LIMIT),
+    after: Optional[str] = None,
+    from_time: Optional[str] = Query(None, alias="from"),
+    to_time: Optional[str] = Query(None, alias="to"),
+    view: Optional[str] = Query(None, pattern="^(day|week|month)$"),
+    date: Optional[str] = None,
+    tz: Optional[str] = None,
+    current_user: User = Depends(require_auth)
+):
+    """One page of the user's events, earliest first
+    
+    Either a [from, to) window, or view=day|week|month around `date` in timezone `tz`
+    (default: the user's settings). A view also trims each event to the fields it renders.
+    """
+    if view and (from_time or to_time):
+        raise HTTPException(status_code=400, detail="Use either view or from/to, not both")
+    
+    # Legacy date/time rows are converted by the legacy_event_datetimes migration; any it
+    # could not convert stay out of the results
+    conditions = [{"session_id": current_user.id}, {"datetime_utc": {"$exists": True}}]
+    if view:
+        window_start, window_end = calendar_view_window(view, date, await resolve_user_timezone(current_user.id, tz))
+        conditions.append(time_condition("datetime_utc", gte=window_start, lt=window_end))
+    elif from_time or to_time:
+        bounds = {}
+        if from_time:
+            bounds["gte"] = parse_event_datetime(from_time)
+        if to_time:
+            bounds["lt"] = parse_event_datetime(to_time)
+        conditions.append(time_condition("datetime_utc", **bounds))
+    if after:
+        conditions.append(events_after_cursor(decode_event_cursor(after)))
+    
+    # Keyset pagination on (datetime_utc, id); one extra row tells us whether there is a next page
+    projection = {"_id": 0, **{field: 1 for field in CALENDAR_VIEW_FIELDS[view]}} if view else None
+    events = await db.calendar_events.find(
+        {"$and": conditions}, projection
+    ).sort([("datetime_utc", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1)
+    
+    if len(events) > limit:
+        events = events[:limit]
+        response.headers["X-Next-Cursor"] = encode_event_cursor(events[-1])
     
+    if view:
+        # Only the projected fields go out
+        return events
+
+    result = []
     for event in events:
-        # Handle both old and new data formats
-        if 'datetime_utc' not in event:
-            # Old format: convert date + time to datetime_utc
-            if 'date' in event and 'time' in event:
-                try:
-                    # Create datetime from date and time, assume UTC for old data
-                    date_str = event['date']
-                    time_str = event.get('time', '12:00')
-                    datetime_str = f"{date_str}T{time_str}:00"
-                    event['datetime_utc'] = datetime.fromisoformat(datetime_str).replace(tzinfo=timezone.utc)
-                except:
-                    # Skip invalid events
-                    continue
-            else:
-                # Skip events without proper date/time
-                continue
-        
         try:
-            result.append(CalendarEvent(**event))
+            result.append(CalendarEvent(**event).dict())
         except Exception as e:
-            # Skip invalid events
-            print(f"Skipping invalid event: {e}")
-            continue
-    
-    # Sort by datetime_utc
-    result.sort(key=lambda x: x.datetime_utc)
+            # The migration makes bad rows rare, not impossible; one shouldn't fail the whole page
+            logging.warning(f"Skipping invalid calendar event {event.get('id')}: {e}")
     return result
 
+def event_reminder_ids(event: Dict[str, Any]) -> List[str]:
+    # Events created before reminders used the event's own id were linked by their ObjectId
+    return [event["id"], str(event["_id"])]
+
+async def replace_event_reminders(event: CalendarEvent, legacy_ids: List[str], session=None) -> int:
+    """Drop an event's reminders and schedule them again from its current time and title"""
+    await db.scheduled_notifications.delete_many(
+        {"event_id": {"$in": legacy_ids}, "session_id": event.session_id}, session=session
+    )
+    if not event.reminder:
+        return 0
+    reminders = build_event_reminders(event.session_id, event.id, event.title, event.datetime_utc, event.reminder_policy)
+    return await insert_scheduled_notifications(reminders, session=session)
+
 @api_router.put("/calendar/events/{event_id}", response_model=CalendarEvent)
 async def update_event(event_id: str, update_data: CalendarEventUpdate, current_user: User = Depends(require_auth)):
     # Build update document
@@ -1303,213 +2398,1240 @@ async def update_event(event_id: str, update_data: CalendarEventUpdate, current_
         update_fields["title"] = update_data.title
     if update_data.description is not None:
         update_fields["description"] = update_data.description
+    if update_data.datetime_utc is not None:
+        update_fields["datetime_utc"] = parse_event_datetime(update_data.datetime_utc)
     if update_data.category is not None:
         update_fields["category"] = update_data.category
+    if update_data.reminder is not None:
+        update_fields["reminder"] = update_data.reminder
     
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    # Update event in database (only user's own events)
-    result = await db.calendar_events.update_one(
-        {"id": event_id, "session_id": current_user.id},
-        {"$set": update_fields}
-    )
+    # Reminder text includes the title, so a rename reschedules too
+    reschedule = any(field in update_fields for field in ("title", "datetime_utc", "reminder"))
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # Return updated event
-    updated_event = await db.calendar_events.find_one({"id": event_id, "session_id": current_user.id})
-    if not updated_event:
-        raise HTTPException(status_code=404, detail="Event not found after update")
+    async def apply_update(session):
+        # Update event in database (only user's own events)
+        result = await db.calendar_events.update_one(
+            {"id": event_id, "session_id": current_user.id},
+            {"$set": update_fields},
+            session=session
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Event not found")
+        
+        updated_event = await db.calendar_events.find_one({"id": event_id, "session_id": current_user.id}, session=session)
+        if not updated_event:
+            raise HTTPException(status_code=404, detail="Event not found after update")
+        
+        event_obj = CalendarEvent(**updated_event)
+        if reschedule:
+            await replace_event_reminders(event_obj, event_reminder_ids(updated_event), session=session)
+        return event_obj
     
-    return CalendarEvent(**updated_event)
+    # The event and its reminders change together or not at all
+    return await run_transaction(apply_update)
 
 @api_router.delete("/calendar/events/{event_id}")
 async def delete_event(event_id: str, current_user: User = Depends(require_auth)):
-    result = await db.calendar_events.delete_one({"id": event_id, "session_id": current_user.id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Event not found")
+    async def apply_delete(session):
+        event = await db.calendar_events.find_one_and_delete({"id": event_id, "session_id": current_user.id}, session=session)
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        
+        # Cascade to the event's pending reminders so they never fire
+        await db.scheduled_notifications.delete_many(
+            {"event_id": {"$in": event_reminder_ids(event)}, "session_id": current_user.id},
+            session=session
+        )
+    
+    await run_transaction(apply_delete)
     return {"message": "Event deleted successfully"}
 
 # =====================================
-# NOTIFICATION HELPER FUNCTIONS  
+# WEB PUSH DELIVERY ENGINE
 # =====================================
 
-async def send_notification_to_session(session_id: str, title: str, body: str, notification_type: str = "general", url: str = "/"):
-    """Helper function to send notification to a specific session"""
-    try:
-        subscription = await db.push_subscriptions.find_one({"session_id": session_id})
-        if not subscription:
-            logging.info(f"No push subscription found for session {session_id}")
+@lru_cache(maxsize=1)
+def vapid_signer() -> Vapid:
+    return Vapid.from_string(private_key=VAPID_PRIVATE_KEY)
+
+def build_push_request(subscription_info: Dict[str, Any], payload: bytes, ttl: int) -> Tuple[str, bytes, Dict[str, str]]:
+    """Encrypt a push payload and sign its VAPID headers (CPU-bound, runs on the crypto pool)"""
+    endpoint = subscription_info["endpoint"]
+    endpoint_url = urlparse(endpoint)
+    
+    # Fresh claims per request - the audience is the push service's origin
+    claims = dict(VAPID_CLAIMS)
+    claims["aud"] = f"{endpoint_url.scheme}://{endpoint_url.netloc}"
+    claims["exp"] = int(time.time()) + 12 * 60 * 60
+    
+    headers = dict(vapid_signer().sign(claims))
+    # pywebpush 2.x only encrypts bytes (1.x accepted str too)
+    encoded = WebPusher(subscription_info).encode(payload, content_encoding="aes128gcm")
+    headers.update({
+        "content-encoding": "aes128gcm",
+        "content-type": "application/octet-stream",
+        "ttl": str(ttl)
+    })
+    return endpoint, encoded["body"], headers
+
+def classify_push_response(endpoint: str, status_code: int, detail: str = "") -> PushDeliveryOutcome:
+    if status_code <= 202:
+        return PushDeliveryOutcome(status="sent", endpoint=endpoint, status_code=status_code)
+    if status_code in (404, 410):
+        # Subscription expired or was revoked by the browser
+        return PushDeliveryOutcome(status="gone", endpoint=endpoint, status_code=status_code, error=detail)
+    if status_code in (408, 429) or status_code >= 500:
+        return PushDeliveryOutcome(status="retryable", endpoint=endpoint, status_code=status_code, error=detail)
+    return PushDeliveryOutcome(status="failed", endpoint=endpoint, status_code=status_code, error=detail)
+
+class PushDeliveryEngine:
+    """Async Web Push sender
+    
+    Payload encryption and VAPID signing run on a small worker pool; the HTTP request goes
+    out over one shared httpx.AsyncClient, which keeps connections open per push-service
+    origin. A semaphore bounds the number of deliveries in flight.
+    """
+    
+    def __init__(self, max_concurrency: int, timeout_seconds: float, crypto_workers: int, ttl_seconds: int):
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.ttl_seconds = ttl_seconds
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.crypto_executor = ThreadPoolExecutor(max_workers=crypto_workers, thread_name_prefix="push-crypto")
+        self.http_client: Optional[httpx.AsyncClient] = None
+    
+    def client(self) -> httpx.AsyncClient:
+        if self.http_client is None or self.http_client.is_closed:
+            self.http_client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+        return self.http_client
+    
+    async def send(self, subscription: Dict[str, Any], payload: Dict[str, Any]) -> PushDeliveryOutcome:
+        """Deliver one payload to one stored push subscription"""
+        endpoint = subscription["endpoint"]
+        subscription_info = {
+            "endpoint": endpoint,
+            "keys": {
+                "p256dh": subscription["p256dh_key"],
+                "auth": subscription["auth_key"]
+            }
+        }
+        
+        async with self.semaphore:
+            try:
+                endpoint, body, headers = await asyncio.get_running_loop().run_in_executor(
+                    self.crypto_executor, build_push_request, subscription_info, json.dumps(payload).encode(), self.ttl_seconds
+                )
+            except Exception as e:
+                return PushDeliveryOutcome(status="failed", endpoint=endpoint, error=f"Encryption failed: {str(e)}")
+            
+            try:
+                response = await self.client().post(endpoint, content=body, headers=headers)
+            except httpx.HTTPError as e:
+                # Timeouts and connection errors are worth another attempt
+                return PushDeliveryOutcome(status="retryable", endpoint=endpoint, error=str(e) or type(e).__name__)
+        
+        return classify_push_response(endpoint, response.status_code, response.text[:200])
+    
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        self.crypto_executor.shutdown(wait=False)
+
+push_engine = PushDeliveryEngine(
+    max_concurrency=PUSH_MAX_CONCURRENCY,
+    timeout_seconds=PUSH_TIMEOUT_SECONDS,
+    crypto_workers=PUSH_CRYPTO_WORKERS,
+    ttl_seconds=PUSH_TTL_SECONDS
+)
+
+# =====================================
+# LLM GATEWAY
+# =====================================
+
+# User on whose behalf the current request calls the model (set by require_auth)
+llm_caller: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_caller", default=None)
+# time.monotonic() by which the current request's model calls must be done (see start_llm_budget)
+llm_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+def start_llm_budget(seconds: float):
+    """Give the rest of the current request `seconds` of model time in total"""
+    llm_deadline.set(time.monotonic() + seconds)
+
+def llm_time_left() -> Optional[float]:
+    deadline = llm_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+class LlmUnavailableError(Exception):
+    """The circuit breaker is open: skip the model and use the deterministic fallback"""
+
+class LlmOverloadedError(Exception):
+    """No LLM capacity for this call: the admission queue is full or timed out, or the provider rate-limited us"""
+    
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+def llm_overloaded_exception(error: LlmOverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Donna is busy right now, please try again shortly ({error.reason})",
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
+class TokenBucket:
+    """Request-rate limiter: `rate` tokens per second, holding at most `burst`"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+    
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def take(self):
+        if self.rate <= 0:
+            return
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class LlmCircuitBreaker:
+    """Error-rate circuit breaker for the model provider
+    
+    closed: calls go through and their outcomes are kept for `window_seconds`; once at least
+    `min_calls` were seen and `error_rate` of them failed, the breaker opens.
+    open: calls are refused (LlmUnavailableError) for `open_seconds`.
+    half_open: one probe call is let through; success closes the breaker, failure reopens it.
+    A probe that never reports back (e.g. the client went away) is replaced after `open_seconds`.
+    """
+    
+    def __init__(self, window_seconds: float, min_calls: int, error_rate: float, open_seconds: float):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.outcomes: deque = deque()  # (monotonic time, ok)
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.times_opened = 0
+    
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if now - self.opened_at < self.open_seconds:
+                return False
+            self.state = "half_open"
+            self.probe_started_at = None
+        if self.probe_started_at is not None and now - self.probe_started_at < self.open_seconds:
             return False
+        self.probe_started_at = now
+        return True
+    
+    def release_probe(self, started_at: Optional[float]):
+        """Free the half-open probe slot taken at `started_at` by a call that never reached the model"""
+        if self.state == "half_open" and started_at is not None and self.probe_started_at == started_at:
+            self.probe_started_at = None
+    
+    def record(self, ok: bool):
+        now = time.monotonic()
+        if self.state == "half_open":
+            if ok:
+                self.state = "closed"
+                self.outcomes.clear()
+            else:
+                self.open(now)
+            return
+        if self.state == "open":
+            return  # a call admitted before the breaker opened
         
-        notification_data = {
-            "title": title,
-            "body": body,
-            "icon": "/favicon.ico",
-            "badge": "/favicon.ico",
-            "url": url,
-            "type": notification_type
+        self.outcomes.append((now, ok))
+        self.trim(now)
+        failures = sum(1 for _, succeeded in self.outcomes if not succeeded)
+        if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate:
+            self.open(now)
+    
+    def open(self, now: float):
+        self.state = "open"
+        self.opened_at = now
+        self.probe_started_at = None
+        self.outcomes.clear()
+        self.times_opened += 1
+        logging.warning(f"LLM circuit breaker opened; using fallbacks for {self.open_seconds:g}s")
+    
+    def trim(self, now: float):
+        while self.outcomes and now - self.outcomes[0][0] > self.window_seconds:
+            self.outcomes.popleft()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        self.trim(time.monotonic())
+        failures = sum(1 for _, ok in self.outcomes if not ok)
+        return {
+            "state": self.state,
+            "window_calls": len(self.outcomes),
+            "window_error_rate": round(failures / len(self.outcomes), 3) if self.outcomes else 0.0,
+            "times_opened": self.times_opened,
+            "open_for_seconds": round(max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)), 1) if self.state == "open" else 0.0,
+            "limits": {
+                "window_seconds": self.window_seconds,
+                "min_calls": self.min_calls,
+                "error_rate": self.error_rate,
+                "open_seconds": self.open_seconds
+            }
         }
+
+class LlmAdmissionController:
+    """Decides when a model call may start
+    
+    A call first takes one of its user's slots (so a single user can't occupy the whole pool),
+    then a global slot, then a rate token. Waiting for all three is bounded by the queue
+    timeout, and once max_queued calls are already waiting new ones are rejected at once;
+    either way the caller gets LlmOverloadedError instead of piling onto the provider. A
+    wait cut short by the caller's own (shorter) deadline is a timeout, not overload.
+    """
+    
+    def __init__(self, max_in_flight: int, max_in_flight_per_user: int, rate_per_second: float, burst: int,
+                 max_queued: int, queue_timeout_seconds: float):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_user = max_in_flight_per_user
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.user_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.user_in_flight: Dict[str, int] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.metrics = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "budget_expired": 0,
+                        "peak_in_flight": 0, "peak_queued": 0, "total_wait_ms": 0.0}
+    
+    async def acquire(self, user: Optional[str], timeout: Optional[float] = None):
+        """Wait for a slot, at most the queue timeout (or `timeout`, if shorter)
         
-        webpush(
-            subscription_info={
-                "endpoint": subscription["endpoint"],
-                "keys": {
-                    "p256dh": subscription["p256dh_key"],
-                    "auth": subscription["auth_key"]
-                }
-            },
-            data=json.dumps(notification_data),
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims=VAPID_CLAIMS
-        )
+        Raises LlmOverloadedError when the queue is full or the queue timeout runs out, and
+        asyncio.TimeoutError when `timeout` runs out first.
+        """
+        if self.queued >= self.max_queued:
+            self.metrics["rejected_queue_full"] += 1
+            raise LlmOverloadedError("queue full", self.queue_timeout_seconds)
         
-        logging.info(f"Notification sent to session {session_id}: {title}")
-        return True
+        self.queued += 1
+        self.metrics["peak_queued"] = max(self.metrics["peak_queued"], self.queued)
+        queued_at = time.perf_counter()
+        cut_by_caller = timeout is not None and timeout < self.queue_timeout_seconds
+        try:
+            await asyncio.wait_for(self.admit(user), timeout if cut_by_caller else self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if cut_by_caller:
+                self.metrics["budget_expired"] += 1
+                raise asyncio.TimeoutError("LLM budget ran out waiting for a model slot")
+            self.metrics["rejected_timeout"] += 1
+            raise LlmOverloadedError("timed out waiting for a model slot", self.queue_timeout_seconds)
+        finally:
+            self.queued -= 1
         
-    except WebPushException as e:
-        logging.error(f"Web push failed for session {session_id}: {str(e)}")
-        # If subscription is invalid, remove it
-        if e.response and e.response.status_code in [404, 410]:
-            await db.push_subscriptions.delete_one({"session_id": session_id})
-        return False
+        self.metrics["admitted"] += 1
+        self.metrics["total_wait_ms"] += (time.perf_counter() - queued_at) * 1000
+        self.metrics["peak_in_flight"] = max(self.metrics["peak_in_flight"], self.in_flight)
+    
+    async def admit(self, user: Optional[str]):
+        # Cancelled by the queue timeout at any await: hand back whatever was taken so far
+        user_semaphore = None
+        if user is not None:
+            user_semaphore = self.user_semaphores.setdefault(user, asyncio.Semaphore(self.max_in_flight_per_user))
+            self.user_in_flight[user] = self.user_in_flight.get(user, 0) + 1
+            try:
+                await user_semaphore.acquire()
+            except BaseException:
+                self.release_user(user, user_semaphore, acquired=False)
+                raise
+        try:
+            await self.semaphore.acquire()
+        except BaseException:
+            self.release_user(user, user_semaphore, acquired=True)
+            raise
+        try:
+            await self.bucket.take()
+        except BaseException:
+            self.semaphore.release()
+            self.release_user(user, user_semaphore, acquired=True)
+            raise
+        self.in_flight += 1
+    
+    def release(self, user: Optional[str]):
+        self.in_flight -= 1
+        self.semaphore.release()
+        self.release_user(user, self.user_semaphores.get(user), acquired=True)
+    
+    def release_user(self, user: Optional[str], user_semaphore: Optional[asyncio.Semaphore], acquired: bool):
+        if user is None or user_semaphore is None:
+            return
+        if acquired:
+            user_semaphore.release()
+        # user_in_flight counts waiting + running calls; drop idle users so the maps stay small
+        self.user_in_flight[user] -= 1
+        if self.user_in_flight[user] == 0:
+            del self.user_in_flight[user]
+            del self.user_semaphores[user]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        metrics = self.metrics
+        self.bucket.refill()
+        return {
+            **metrics,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "active_users": len(self.user_in_flight),
+            "rate_tokens": round(self.bucket.tokens, 2) if self.bucket.rate > 0 else None,
+            "total_wait_ms": round(metrics["total_wait_ms"], 2),
+            "avg_wait_ms": round(metrics["total_wait_ms"] / metrics["admitted"], 2) if metrics["admitted"] else 0.0,
+            "limits": {
+                "max_in_flight": self.max_in_flight,
+                "max_in_flight_per_user": self.max_in_flight_per_user,
+                "rate_per_second": self.bucket.rate,
+                "burst": self.bucket.burst,
+                "max_queued": self.max_queued,
+                "queue_timeout_seconds": self.queue_timeout_seconds
+            }
+        }
+
+class LlmPrompt(BaseModel):
+    system_message: str
+    timeout_seconds: float = LLM_TIMEOUT_SECONDS
+    session_id: str  # LlmChat session tag when there is no per-user one
+    budget_share: float = 1.0  # Most this call may use of the request's remaining model time
+
+# Every prompt the app sends, by id; callers only pass the id and the user text. Detectors may
+# use half of what is left of a chat turn's budget, keeping the rest for the reply
+LLM_PROMPTS: Dict[str, LlmPrompt] = {
+    "health_detection": LlmPrompt(system_message=HEALTH_DETECTION_SYSTEM_MESSAGE, timeout_seconds=10, session_id="health_processing", budget_share=0.5),
+    "health_confirmation": LlmPrompt(system_message=HEALTH_CONFIRMATION_SYSTEM_MESSAGE, timeout_seconds=8, session_id="health_confirmation"),
+    "gift_detection": LlmPrompt(system_message=GIFT_DETECTION_SYSTEM_MESSAGE, timeout_seconds=10, session_id="gift_detection", budget_share=0.5),
+    "intent_extraction": LlmPrompt(system_message=INTENT_EXTRACTION_SYSTEM_MESSAGE, timeout_seconds=12, session_id="intent_extraction", budget_share=0.5),
+    "donna_reply": LlmPrompt(system_message=DONNA_SYSTEM_MESSAGE, timeout_seconds=20, session_id="donna_chat"),
+    "career_plan": LlmPrompt(system_message=CAREER_PLAN_SYSTEM_MESSAGE, timeout_seconds=30, session_id="career_planning"),
+    "weekly_analytics": LlmPrompt(system_message=WEEKLY_ANALYTICS_SYSTEM_MESSAGE, timeout_seconds=45, session_id="weekly_analytics"),
+}
+
+def raise_for_provider_status(response: httpx.Response):
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("retry-after", ""))
+        except ValueError:
+            retry_after = LLM_QUEUE_TIMEOUT_SECONDS
+        raise LlmOverloadedError("model provider rate limit", retry_after)
+    response.raise_for_status()
+
+class LlmGateway:
+    """Single entry point for LLM completions
+    
+    With a base URL, requests go to its /chat/completions over one shared httpx.AsyncClient,
+    so a chat turn reuses an open connection instead of paying a new TCP + TLS handshake.
+    Without one they go through LlmChat, a new client per call. Either way each call is refused while the circuit
+    breaker is open, then gets past the admission controller, is bounded by its prompt's
+    timeout (or an explicit override) and the request's deadline budget, and is counted per
+    prompt id.
+    """
+    
+    def __init__(self, base_url: str, api_key: Optional[str], model: str, max_connections: int, prompts: Dict[str, LlmPrompt],
+                 admission: LlmAdmissionController, breaker: LlmCircuitBreaker):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.max_connections = max_connections
+        self.prompts = prompts
+        self.admission = admission
+        self.breaker = breaker
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+    
+    def client(self) -> httpx.AsyncClient:
+        if self.http_client is None or self.http_client.is_closed:
+            self.http_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else None,
+                timeout=LLM_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self.http_client
+    
+    async def complete(self, prompt_id: str, text: str, session_id: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """Run one registered prompt against the user text and return the model's reply"""
+        prompt = self.prompts[prompt_id]
+        stats = self.prompt_stats(prompt_id)
+        stats["calls"] += 1
+        deadline, probe = self.start_call(prompt, stats, timeout)
+        user = await self.admit(stats, deadline, probe)
+        started = time.perf_counter()
+        try:
+            if self.base_url:
+                request = self.complete_http(prompt, text)
+            else:
+                request = self.complete_llm_chat(prompt, text, session_id or prompt.session_id)
+            reply = await asyncio.wait_for(request, deadline - time.monotonic())
+            self.breaker.record(True)
+            return reply
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            self.breaker.record(False)
+            raise
+        except LlmOverloadedError:
+            stats["rejected"] += 1
+            self.breaker.record(False)
+            raise
+        except Exception:
+            stats["errors"] += 1
+            self.breaker.record(False)
+            raise
+        finally:
+            self.admission.release(user)
+            stats["total_ms"] += (time.perf_counter() - started) * 1000
+    
+    async def stream(self, prompt_id: str, text: str, session_id: Optional[str] = None, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Like complete(), but yields the reply in chunks as the model produces them
+        
+        Only the HTTP transport streams; through LlmChat the whole reply arrives as one
+        chunk. The timeout bounds the whole stream, not each chunk.
+        """
+        prompt = self.prompts[prompt_id]
+        if not self.base_url:
+            yield await self.complete(prompt_id, text, session_id=session_id, timeout=timeout)
+            return
+        
+        stats = self.prompt_stats(prompt_id)
+        stats["calls"] += 1
+        stats["streams"] += 1
+        deadline, probe = self.start_call(prompt, stats, timeout)
+        user = await self.admit(stats, deadline, probe)
+        started = time.perf_counter()
+        first_chunk = True
+        chunks = self.stream_http(prompt, text)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadline - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                if first_chunk:
+                    first_chunk = False
+                    stats["first_token_ms"] += (time.perf_counter() - started) * 1000
+                yield chunk
+            self.breaker.record(True)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            self.breaker.record(False)
+            raise
+        except LlmOverloadedError:
+            stats["rejected"] += 1
+            self.breaker.record(False)
+            raise
+        except Exception:
+            stats["errors"] += 1
+            self.breaker.record(False)
+            raise
+        finally:
+            await chunks.aclose()
+            self.admission.release(user)
+            stats["total_ms"] += (time.perf_counter() - started) * 1000
+    
+    def start_call(self, prompt: LlmPrompt, stats: Dict[str, Any], timeout: Optional[float]) -> Tuple[float, Optional[float]]:
+        """Check the breaker and work out the call's deadline (time.monotonic())
+        
+        The call gets its prompt's timeout (or the override), cut down to its share of the
+        request's remaining budget. Raises LlmUnavailableError while the breaker is open and
+        asyncio.TimeoutError when the budget is already spent, before any waiting. Also returns
+        the breaker's probe mark when this call is the half-open probe, for admit().
+        """
+        if not self.breaker.allow():
+            stats["short_circuited"] += 1
+            raise LlmUnavailableError("LLM circuit breaker is open")
+        probe = self.breaker.probe_started_at if self.breaker.state == "half_open" else None
+        
+        seconds = timeout or prompt.timeout_seconds
+        time_left = llm_time_left()
+        if time_left is not None:
+            seconds = min(seconds, time_left * prompt.budget_share)
+        if seconds <= 0:
+            # Says nothing about the provider, so it mustn't hold the probe slot either
+            self.breaker.release_probe(probe)
+            stats["timeouts"] += 1
+            raise asyncio.TimeoutError("LLM budget for this request is spent")
+        return time.monotonic() + seconds, probe
+    
+    async def admit(self, stats: Dict[str, Any], deadline: float, probe: Optional[float]) -> Optional[str]:
+        """Wait (until the deadline at most) for an admission slot for the current request's user; returns that user for release()"""
+        user = llm_caller.get()
+        try:
+            await self.admission.acquire(user, timeout=deadline - time.monotonic())
+        except BaseException as e:
+            self.breaker.release_probe(probe)
+            if isinstance(e, LlmOverloadedError):
+                stats["rejected"] += 1
+            elif isinstance(e, asyncio.TimeoutError):
+                stats["timeouts"] += 1
+            raise
+        return user
+    
+    def prompt_stats(self, prompt_id: str) -> Dict[str, Any]:
+        return self.metrics.setdefault(prompt_id, {
+            "calls": 0, "streams": 0, "errors": 0, "timeouts": 0, "rejected": 0, "short_circuited": 0,
+            "total_ms": 0.0, "first_token_ms": 0.0
+        })
+    
+    async def complete_http(self, prompt: LlmPrompt, text: str) -> str:
+        response = await self.client().post("/chat/completions", json={
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": prompt.system_message},
+                {"role": "user", "content": text}
+            ]
+        })
+        raise_for_provider_status(response)
+        return response.json()["choices"][0]["message"]["content"]
+    
+    async def stream_http(self, prompt: LlmPrompt, text: str) -> AsyncIterator[str]:
+        request = {
+            "model": self.model,
+            "stream": True,
+            "messages": [
+                {"role": "system", "content": prompt.system_message},
+                {"role": "user", "content": text}
+            ]
+        }
+        async with self.client().stream("POST", "/chat/completions", json=request) as response:
+            raise_for_provider_status(response)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+    
+    async def complete_llm_chat(self, prompt: LlmPrompt, text: str, session_id: str) -> str:
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=prompt.system_message
+        ).with_model(LLM_PROVIDER, self.model)
+        try:
+            return await chat.send_message(UserMessage(text=text))
+        except Exception as e:
+            # LlmChat surfaces the provider's 429 as a RateLimitError
+            if type(e).__name__ == "RateLimitError":
+                raise LlmOverloadedError("model provider rate limit", self.admission.queue_timeout_seconds)
+            raise
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "transport": "http" if self.base_url else "llm_chat",
+            "max_connections": self.max_connections,
+            "admission": self.admission.snapshot(),
+            "breaker": self.breaker.snapshot(),
+            "prompts": {
+                prompt_id: {
+                    **stats,
+                    "total_ms": round(stats["total_ms"], 2),
+                    "first_token_ms": round(stats["first_token_ms"], 2),
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0.0,
+                    "avg_first_token_ms": round(stats["first_token_ms"] / stats["streams"], 2) if stats["streams"] else None
+                }
+                for prompt_id, stats in self.metrics.items()
+            }
+        }
+    
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+llm_gateway = LlmGateway(
+    base_url=LLM_BASE_URL,
+    api_key=LLM_API_KEY,
+    model=LLM_MODEL,
+    max_connections=LLM_MAX_CONNECTIONS,
+    prompts=LLM_PROMPTS,
+    admission=LlmAdmissionController(
+        max_in_flight=LLM_MAX_IN_FLIGHT,
+        max_in_flight_per_user=LLM_MAX_IN_FLIGHT_PER_USER,
+        rate_per_second=LLM_RATE_PER_SECOND,
+        burst=LLM_RATE_BURST,
+        max_queued=LLM_MAX_QUEUED,
+        queue_timeout_seconds=LLM_QUEUE_TIMEOUT_SECONDS
+    ),
+    breaker=LlmCircuitBreaker(
+        window_seconds=LLM_BREAKER_WINDOW_SECONDS,
+        min_calls=LLM_BREAKER_MIN_CALLS,
+        error_rate=LLM_BREAKER_ERROR_RATE,
+        open_seconds=LLM_BREAKER_OPEN_SECONDS
+    )
+)
+
+# =====================================
+# NOTIFICATION HELPER FUNCTIONS  
+# =====================================
+
+async def send_to_subscriptions(subscriptions: List[Dict[str, Any]], notification_data: Dict[str, Any]) -> List[PushDeliveryOutcome]:
+    """Deliver one payload to every device at once"""
+    return list(await asyncio.gather(*(push_engine.send(subscription, notification_data) for subscription in subscriptions)))
+
+def combine_push_outcomes(outcomes: List[PushDeliveryOutcome]) -> PushDeliveryOutcome:
+    """Summarize per-device outcomes: delivered if any device got it, retryable if any device might"""
+    if not outcomes:
+        return PushDeliveryOutcome(status="no_subscription")
+    for status in ("sent", "retryable", "failed"):
+        for outcome in outcomes:
+            if outcome.status == status:
+                return outcome
+    return outcomes[0]  # Every device is gone
+
+async def fan_out_notification(session_id: str, notification_data: Dict[str, Any]) -> List[PushDeliveryOutcome]:
+    """Send to all of a session's devices and prune the endpoints the push service says are gone"""
+    subscriptions = await db.push_subscriptions.find(
+        {"session_id": session_id}
+    ).sort("updated_at", -1).to_list(PUSH_MAX_DEVICES_PER_SESSION)
+    outcomes = await send_to_subscriptions(subscriptions, notification_data)
+    
+    gone_endpoints = [outcome.endpoint for outcome in outcomes if outcome.status == "gone"]
+    if gone_endpoints:
+        # Only the expired devices - the session's other devices keep their subscriptions
+        await db.push_subscriptions.delete_many({"session_id": session_id, "endpoint": {"$in": gone_endpoints}})
+        logging.info(f"Pruned {len(gone_endpoints)} expired push subscription(s) for session {session_id}")
+    
+    return outcomes
+
+async def deliver_notification_to_session(session_id: str, title: str, body: str, notification_type: str = "general", url: str = "/") -> PushDeliveryOutcome:
+    """Send a notification to every device of a session and report the combined outcome"""
+    notification_data = {
+        "title": title,
+        "body": body,
+        "icon": "/favicon.ico",
+        "badge": "/favicon.ico",
+        "url": url,
+        "type": notification_type
+    }
+    
+    outcomes = await fan_out_notification(session_id, notification_data)
+    outcome = combine_push_outcomes(outcomes)
+    
+    if outcome.status == "sent":
+        delivered = sum(1 for device_outcome in outcomes if device_outcome.status == "sent")
+        logging.info(f"Notification sent to {delivered}/{len(outcomes)} device(s) of session {session_id}: {title}")
+    elif outcome.status == "no_subscription":
+        logging.info(f"No push subscription found for session {session_id}")
+    else:
+        logging.error(f"Web push {outcome.status} for session {session_id}: {outcome.status_code} {outcome.error}")
+    
+    return outcome
+
+async def send_notification_to_session(session_id: str, title: str, body: str, notification_type: str = "general", url: str = "/"):
+    """Helper function to send notification to a specific session"""
+    try:
+        outcome = await deliver_notification_to_session(session_id, title, body, notification_type, url)
+        return outcome.status == "sent"
     except Exception as e:
         logging.error(f"Notification error for session {session_id}: {str(e)}")
         return False
 
+# Event reminder offsets, by policy. Gift occasions get an extra week's notice to shop.
+REMINDER_POLICIES = {
+    "standard": [
+        {
+            "hours_before": 12,
+            "title": "📅 Upcoming Event Reminder",
+            "body": "Don't forget: {event_title} in 12 hours"
+        },
+        {
+            "hours_before": 2,
+            "title": "⏰ Event Starting Soon",
+            "body": "{event_title} starts in 2 hours"
+        }
+    ]
+}
+REMINDER_POLICIES["gift"] = [
+    {
+        "hours_before": 168,  # 7 days = 168 hours
+        "title": "🎁 Gift Planning Reminder",
+        "body": "Gift occasion coming up: {event_title} in 7 days. Time to prepare!"
+    },
+    *REMINDER_POLICIES["standard"]
+]
+
+def build_event_reminders(session_id: str, event_id: str, event_title: str, event_datetime: datetime, policy: str = "standard") -> List[ScheduledNotification]:
+    """The reminders a policy calls for, skipping any whose time has already passed"""
+    now = datetime.now(timezone.utc)
+    reminders = []
+    for reminder in REMINDER_POLICIES[policy]:
+        reminder_time = event_datetime - timedelta(hours=reminder["hours_before"])
+        if reminder_time > now:
+            reminders.append(ScheduledNotification(
+                session_id=session_id,
+                event_id=event_id,
+                title=reminder["title"],
+                body=reminder["body"].format(event_title=event_title),
+                scheduled_time=reminder_time,
+                notification_type="reminder",
+                reminder_offset_hours=reminder["hours_before"]
+            ))
+    return reminders
+
+async def insert_scheduled_notifications(notifications: List[ScheduledNotification], session=None) -> int:
+    """Bulk-insert notifications and return how many were new
+    
+    Unordered insert_many, so one duplicate doesn't stop the rest of the chunk. Event
+    reminders are unique per (event_id, reminder_offset_hours), which makes scheduling
+    the same event twice a no-op.
+    """
+    inserted = 0
+    for start in range(0, len(notifications), REMINDER_INSERT_BATCH_SIZE):
+        chunk = [prepare_for_mongo(notification.dict()) for notification in notifications[start:start + REMINDER_INSERT_BATCH_SIZE]]
+        try:
+            result = await db.scheduled_notifications.insert_many(chunk, ordered=False, session=session)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+    return inserted
+
+async def schedule_reminders_for_events(events: List[CalendarEvent], policy: str = "standard") -> int:
+    """Schedule reminders for many events in a few round trips (bulk imports)"""
+    notifications = []
+    for event in events:
+        if event.reminder:
+            notifications.extend(build_event_reminders(event.session_id, event.id, event.title, event.datetime_utc, policy))
+    return await insert_scheduled_notifications(notifications)
+
 async def schedule_event_reminders(session_id: str, event_id: str, event_title: str, event_datetime: datetime, is_gift_event: bool = False):
     """Schedule push notifications for calendar event reminders"""
     try:
-        # Standard reminders: 12 hours and 2 hours before
-        reminders = [
-            {
-                "hours_before": 12,
-                "title": "📅 Upcoming Event Reminder",
-                "body": f"Don't forget: {event_title} in 12 hours"
-            },
-            {
-                "hours_before": 2,
-                "title": "⏰ Event Starting Soon",
-                "body": f"{event_title} starts in 2 hours"
-            }
-        ]
-        
-        # Add special 7-day reminder for gift events
-        if is_gift_event:
-            reminders.insert(0, {
-                "hours_before": 168,  # 7 days = 168 hours
-                "title": "🎁 Gift Planning Reminder",
-                "body": f"Gift occasion coming up: {event_title} in 7 days. Time to prepare!"
-            })
-        
-        # Schedule each reminder
-        for reminder in reminders:
-            reminder_time = event_datetime - timedelta(hours=reminder["hours_before"])
-            
-            # Only schedule future reminders
-            if reminder_time > datetime.now(timezone.utc):
-                scheduled_notification = ScheduledNotification(
-                    session_id=session_id,
-                    event_id=event_id,
-                    title=reminder["title"],
-                    body=reminder["body"],
-                    scheduled_time=reminder_time,
-                    notification_type="reminder"
-                )
-                
-                await db.scheduled_notifications.insert_one(prepare_for_mongo(scheduled_notification.dict()))
-                logging.info(f"Scheduled reminder for {event_title} at {reminder_time}")
-        
+        reminders = build_event_reminders(session_id, event_id, event_title, event_datetime, "gift" if is_gift_event else "standard")
+        inserted = await insert_scheduled_notifications(reminders)
+        logging.info(f"Scheduled {inserted} reminder(s) for {event_title}")
         return True
         
     except Exception as e:
         logging.error(f"Error scheduling reminders: {str(e)}")
         return False
 
-async def send_due_notifications():
-    """Background task to send due notifications (call this periodically)"""
+# Every stage of the delivery state machine keeps its next due time in next_attempt_at:
+# the scheduled time while pending, the backoff time while retry_scheduled, and the lease
+# expiry while in_flight (so a crashed worker's claims come due again on their own).
+# Each dispatcher lane is then an equality on status plus a range on next_attempt_at,
+# served by the (status, next_attempt_at) index.
+FRESH_NOTIFICATION_STATUSES = ["pending", "in_flight"]
+RETRY_NOTIFICATION_STATUSES = ["retry_scheduled"]
+
+def due_notifications_query(current_time: datetime, statuses: List[str] = FRESH_NOTIFICATION_STATUSES) -> Dict[str, Any]:
+    return {
+        "status": {"$in": statuses},
+        **time_condition("next_attempt_at", lte=current_time)
+    }
+
+def notification_retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: half the capped delay is fixed, the other half random"""
+    delay = min(NOTIFICATION_RETRY_MAX_SECONDS, NOTIFICATION_RETRY_BASE_SECONDS * (2 ** (attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+notification_delivery_metrics = {
+    "claimed": 0,
+    "reclaimed": 0,  # claims taken over from an expired lease
+    "lost_leases": 0,  # deliveries finished after another worker took the claim
+    "delivered": 0,
+    "retries_scheduled": 0,
+    "skipped": 0,  # the user has no push subscription
+    "dead_lettered": 0
+}
+
+async def claim_notification(query: Dict[str, Any], current_time: datetime) -> Optional[Dict[str, Any]]:
+    """Atomically lease the most overdue matching notification to this worker and count the attempt"""
+    lease_until = current_time + timedelta(seconds=NOTIFICATION_LEASE_SECONDS)
+    previous = await db.scheduled_notifications.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "in_flight",
+                "claimed_by": DISPATCHER_WORKER_ID,
+                "claimed_at": current_time,
+                "next_attempt_at": lease_until
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous:
+        return None
+    
+    notification_delivery_metrics["claimed"] += 1
+    if previous.get("status") == "in_flight":
+        notification_delivery_metrics["reclaimed"] += 1
+        logging.warning(f"Reclaimed notification {previous['id']} from expired lease held by {previous.get('claimed_by')}")
+    previous["attempts"] = previous.get("attempts", 0) + 1
+    return previous
+
+async def finish_claimed_notification(notification: Dict[str, Any], update: Dict[str, Any]) -> bool:
+    """Apply the delivery result - only if this worker still holds the lease"""
+    result = await db.scheduled_notifications.update_one(
+        {"id": notification["id"], "claimed_by": DISPATCHER_WORKER_ID, "status": "in_flight"},
+        update
+    )
+    if result.modified_count == 0:
+        notification_delivery_metrics["lost_leases"] += 1
+        logging.warning(f"Lease on notification {notification['id']} expired before delivery finished")
+        return False
+    return True
+
+async def dead_letter_notification(notification: Dict[str, Any], outcome: PushDeliveryOutcome):
+    now = datetime.now(timezone.utc)
+    finished = await finish_claimed_notification(notification, {"$set": {
+        "status": "dead",
+        "last_error": outcome.error or outcome.status,
+        "next_attempt_at": None
+    }})
+    if not finished:
+        return
+    
+    dead_letter = NotificationDeadLetter(
+        notification_id=notification["id"],
+        session_id=notification["session_id"],
+        title=notification["title"],
+        body=notification["body"],
+        notification_type=notification["notification_type"],
+        reason=outcome.status,
+        status_code=outcome.status_code,
+        error=outcome.error,
+        attempts=notification["attempts"],
+        created_at=now
+    )
+    await db.notification_dead_letters.insert_one(prepare_for_mongo(dead_letter.dict()))
+    notification_delivery_metrics["dead_lettered"] += 1
+    logging.error(f"Dead-lettered notification {notification['id']} after {notification['attempts']} attempt(s): {outcome.status}")
+
+async def send_claimed_notification(notification: Dict[str, Any]):
+    try:
+        outcome = await deliver_notification_to_session(
+            notification["session_id"],
+            notification["title"],
+            notification["body"],
+            notification["notification_type"]
+        )
+    except Exception as e:
+        outcome = PushDeliveryOutcome(status="retryable", error=str(e))
+    
+    now = datetime.now(timezone.utc)
+    if outcome.status == "sent":
+        if await finish_claimed_notification(notification, {"$set": {
+            "status": "delivered",
+            "sent": True,
+            "sent_at": now,
+            "next_attempt_at": None,
+            "last_error": None
+        }}):
+            notification_delivery_metrics["delivered"] += 1
+    elif outcome.status == "retryable" and notification["attempts"] < NOTIFICATION_MAX_ATTEMPTS:
+        next_attempt_at = now + timedelta(seconds=notification_retry_delay(notification["attempts"]))
+        if await finish_claimed_notification(notification, {"$set": {
+            "status": "retry_scheduled",
+            "next_attempt_at": next_attempt_at,
+            "last_error": outcome.error or outcome.status
+        }}):
+            notification_delivery_metrics["retries_scheduled"] += 1
+            logging.info(f"Notification {notification['id']} attempt {notification['attempts']} failed, retrying at {next_attempt_at}")
+    elif outcome.status == "no_subscription":
+        # The user never enabled push: nothing to fix or replay, so no dead letter
+        if await finish_claimed_notification(notification, {"$set": {
+            "status": "skipped",
+            "next_attempt_at": None,
+            "last_error": "no_subscription"
+        }}):
+            notification_delivery_metrics["skipped"] += 1
+            logging.info(f"Skipped notification {notification['id']}: session {notification['session_id']} has no push subscription")
+    else:
+        # Expired subscription, permanent rejection, or out of attempts
+        await dead_letter_notification(notification, outcome)
+
+async def send_due_notifications(batch_size: int = NOTIFICATION_DISPATCH_BATCH_SIZE):
+    """Claim and send up to one page of due notifications, oldest first
+    
+    Safe to run on any number of workers at once: each notification is leased to exactly
+    one worker by an atomic find_one_and_update before it is sent. Fresh notifications are
+    claimed first; due retries fill whatever room is left in the page.
+    """
     try:
         current_time = datetime.now(timezone.utc)
         
-        # Find notifications that are due
-        due_notifications = await db.scheduled_notifications.find({
-            "scheduled_time": {"$lte": current_time},
-            "sent": False
-        }).to_list(100)
-        
-        for notification in due_notifications:
-            success = await send_notification_to_session(
-                notification["session_id"],
-                notification["title"],
-                notification["body"],
-                notification["notification_type"]
-            )
-            
-            # Mark as sent
-            await db.scheduled_notifications.update_one(
-                {"id": notification["id"]},
-                {
-                    "$set": {
-                        "sent": True,
-                        "sent_at": current_time
-                    }
-                }
-            )
-            
-            logging.info(f"Processed notification {notification['id']}: {'sent' if success else 'failed'}")
+        # Start each delivery as soon as its claim lands so claiming and sending overlap
+        deliveries = []
+        for statuses in (FRESH_NOTIFICATION_STATUSES, RETRY_NOTIFICATION_STATUSES):
+            query = due_notifications_query(current_time, statuses)
+            while len(deliveries) < batch_size:
+                notification = await claim_notification(query, current_time)
+                if not notification:
+                    break
+                deliveries.append(asyncio.create_task(send_claimed_notification(notification)))
+        
+        # The push engine bounds how many of these are in flight at once
+        results = await asyncio.gather(*deliveries, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.error(f"Error sending claimed notification: {str(result)}")
         
-        return len(due_notifications)
+        return len(deliveries)
         
     except Exception as e:
         logging.error(f"Error sending due notifications: {str(e)}")
         return 0
 
+async def oldest_due_notification_lag() -> float:
+    """Seconds between now and the scheduled_time of the oldest pending due notification"""
+    current_time = datetime.now(timezone.utc)
+    oldest = await db.scheduled_notifications.find_one(
+        due_notifications_query(current_time, ["pending"]),
+        projection={"scheduled_time": 1},
+        sort=[("next_attempt_at", 1)]
+    )
+    if not oldest:
+        return 0.0
+    
+    scheduled_time = parse_stored_datetime(oldest["scheduled_time"])
+    if not scheduled_time:
+        return 0.0
+    return max((current_time - scheduled_time).total_seconds(), 0.0)
+
+class NotificationDispatcher:
+    """Background loop that sends due scheduled notifications
+    
+    Each tick drains the backlog a page at a time until a short page comes back (or the
+    per-tick page cap is hit), then sleeps for the interval. Stopping lets the page in
+    flight finish instead of abandoning half-sent reminders.
+    """
+    
+    def __init__(self, interval_seconds: float, batch_size: int, max_pages: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_pages = max_pages
+        self.task: Optional[asyncio.Task] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.metrics = {
+            "ticks": 0,
+            "errors": 0,
+            "processed": 0,
+            "last_tick_at": None,
+            "last_tick_ms": 0.0,
+            "last_tick_processed": 0,
+            "last_tick_pages": 0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0
+        }
+    
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+    
+    def start(self):
+        if self.running:
+            return
+        self.stop_event = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+        logging.info(f"Notification dispatcher started (every {self.interval_seconds:g}s, batch size {self.batch_size})")
+    
+    async def stop(self):
+        if not self.running:
+            return
+        self.stop_event.set()
+        try:
+            # Enough time for the page in flight to hit the push timeout
+            await asyncio.wait_for(self.task, timeout=PUSH_TIMEOUT_SECONDS + 5)
+        except asyncio.TimeoutError:
+            logging.warning("Notification dispatcher did not stop in time; cancelled")
+        self.task = None
+        logging.info("Notification dispatcher stopped")
+    
+    async def run(self):
+        while not self.stop_event.is_set():
+            try:
+                await self.tick()
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logging.error(f"Notification dispatcher tick failed: {str(e)}")
+            
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def tick(self):
+        started = time.perf_counter()
+        lag_seconds = await oldest_due_notification_lag()
+        
+        processed = 0
+        pages = 0
+        while pages < self.max_pages and not self.stop_event.is_set():
+            count = await send_due_notifications(self.batch_size)
+            processed += count
+            pages += 1
+            if count < self.batch_size:
+                break
+        
+        self.metrics["ticks"] += 1
+        self.metrics["processed"] += processed
+        self.metrics["last_tick_at"] = datetime.now(timezone.utc).isoformat()
+        self.metrics["last_tick_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.metrics["last_tick_processed"] = processed
+        self.metrics["last_tick_pages"] = pages
+        self.metrics["last_lag_seconds"] = round(lag_seconds, 2)
+        self.metrics["max_lag_seconds"] = max(self.metrics["max_lag_seconds"], round(lag_seconds, 2))
+        
+        if processed:
+            logging.info(f"Dispatched {processed} notifications in {pages} page(s), oldest was {lag_seconds:.1f}s late")
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "running": self.running,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "worker_id": DISPATCHER_WORKER_ID,
+            "lease_seconds": NOTIFICATION_LEASE_SECONDS,
+            "max_attempts": NOTIFICATION_MAX_ATTEMPTS,
+            **notification_delivery_metrics
+        }
+
+notification_dispatcher = NotificationDispatcher(
+    interval_seconds=NOTIFICATION_DISPATCH_INTERVAL_SECONDS,
+    batch_size=NOTIFICATION_DISPATCH_BATCH_SIZE,
+    max_pages=NOTIFICATION_DISPATCH_MAX_PAGES
+)
+
+reminder_gc_metrics = {
+    "runs": 0,
+    "scanned": 0,
+    "deleted": 0,
+    "last_run_at": None
+}
+reminder_gc_task: Optional[asyncio.Task] = None
+
+async def collect_orphaned_reminders(batch_size: int = REMINDER_GC_BATCH_SIZE) -> int:
+    """Delete unsent reminders whose calendar event no longer exists
+    
+    Catches anything the cascade in delete_event missed, such as events removed
+    directly in the database or reminders left by older versions.
+    """
+    deleted = 0
+    last_id = None
+    while True:
+        query = {"event_id": {"$ne": None}, "sent": False}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        page = await db.scheduled_notifications.find(query, projection={"event_id": 1}).sort("_id", 1).to_list(batch_size)
+        if not page:
+            break
+        last_id = page[-1]["_id"]
+        reminder_gc_metrics["scanned"] += len(page)
+        
+        event_ids = {reminder["event_id"] for reminder in page}
+        legacy_object_ids = [ObjectId(event_id) for event_id in event_ids if ObjectId.is_valid(event_id)]
+        events = await db.calendar_events.find(
+            {"$or": [{"id": {"$in": list(event_ids)}}, {"_id": {"$in": legacy_object_ids}}]},
+            projection={"id": 1}
+        ).to_list(None)
+        live_ids = {event.get("id") for event in events} | {str(event["_id"]) for event in events}
+        
+        orphaned_ids = list(event_ids - live_ids)
+        if orphaned_ids:
+            result = await db.scheduled_notifications.delete_many({"event_id": {"$in": orphaned_ids}, "sent": False})
+            deleted += result.deleted_count
+        
+        if len(page) < batch_size:
+            break
+    
+    reminder_gc_metrics["runs"] += 1
+    reminder_gc_metrics["deleted"] += deleted
+    reminder_gc_metrics["last_run_at"] = datetime.now(timezone.utc).isoformat()
+    if deleted:
+        logging.info(f"Removed {deleted} orphaned reminder(s)")
+    return deleted
+
+async def run_reminder_gc():
+    while True:
+        try:
+            await collect_orphaned_reminders()
+        except Exception as e:
+            logging.error(f"Orphaned reminder cleanup failed: {str(e)}")
+        await asyncio.sleep(REMINDER_GC_INTERVAL_SECONDS)
+
 # =====================================
 # NOTIFICATION ENDPOINTS
 # =====================================
 
 @api_router.post("/notifications/subscription", response_model=PushSubscription)
 async def create_push_subscription(subscription: PushSubscriptionCreate):
-    """Store a push subscription for a user session"""
+    """Store a push subscription for one of a session's devices (one per endpoint)"""
     try:
-        # Check if subscription already exists for this session
-        existing = await db.push_subscriptions.find_one({"session_id": subscription.session_id})
-        
-        if existing:
-            # Update existing subscription
-            update_data = {
-                "endpoint": subscription.endpoint,
-                "p256dh_key": subscription.p256dh_key,
-                "auth_key": subscription.auth_key,
-                "user_agent": subscription.user_agent,
-                "updated_at": datetime.now(timezone.utc)
-            }
-            await db.push_subscriptions.update_one(
-                {"session_id": subscription.session_id},
-                {"$set": update_data}
-            )
-            
-            # Return updated subscription
-            updated = await db.push_subscriptions.find_one({"session_id": subscription.session_id})
-            return PushSubscription(**updated)
-        else:
-            # Create new subscription
-            subscription_obj = PushSubscription(**subscription.dict())
-            await db.push_subscriptions.insert_one(prepare_for_mongo(subscription_obj.dict()))
-            return subscription_obj
+        now = datetime.now(timezone.utc)
+        new_subscription = PushSubscription(**subscription.dict())
+        
+        # Re-subscribing the same browser refreshes its keys; a new device adds a row
+        await db.push_subscriptions.update_one(
+            {"endpoint": subscription.endpoint},
+            {
+                "$set": {
+                    "session_id": subscription.session_id,
+                    "p256dh_key": subscription.p256dh_key,
+                    "auth_key": subscription.auth_key,
+                    "user_agent": subscription.user_agent,
+                    "updated_at": now
+                },
+                "$setOnInsert": {
+                    "id": new_subscription.id,
+                    "created_at": now
+                }
+            },
+            upsert=True
+        )
+        
+        stored = await db.push_subscriptions.find_one({"endpoint": subscription.endpoint})
+        return PushSubscription(**stored)
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to store subscription: {str(e)}")
 
 @api_router.delete("/notifications/subscription/{session_id}")
-async def delete_push_subscription(session_id: str):
-    """Remove push subscription for a user session"""
-    result = await db.push_subscriptions.delete_one({"session_id": session_id})
+async def delete_push_subscription(session_id: str, endpoint: Optional[str] = None):
+    """Remove one device's push subscription, or all of a session's when no endpoint is given"""
+    query = {"session_id": session_id}
+    if endpoint:
+        query["endpoint"] = endpoint
+    result = await db.push_subscriptions.delete_many(query)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Subscription not found")
-    return {"message": "Subscription deleted successfully"}
+    return {"message": "Subscription deleted successfully", "deleted": result.deleted_count}
 
 @api_router.get("/notifications/vapid-public-key")
 async def get_vapid_public_key():
@@ -1518,13 +3640,8 @@ async def get_vapid_public_key():
 
 @api_router.post("/notifications/send")
 async def send_push_notification(payload: NotificationPayload, session_id: str):
-    """Send push notification to a specific user session"""
+    """Send push notification to every device of a user session"""
     try:
-        # Get user's push subscription
-        subscription = await db.push_subscriptions.find_one({"session_id": session_id})
-        if not subscription:
-            raise HTTPException(status_code=404, detail="No push subscription found for this session")
-        
         # Prepare notification data
         notification_data = {
             "title": payload.title,
@@ -1536,28 +3653,17 @@ async def send_push_notification(payload: NotificationPayload, session_id: str):
         }
         
         # Send push notification
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": subscription["endpoint"],
-                    "keys": {
-                        "p256dh": subscription["p256dh_key"],
-                        "auth": subscription["auth_key"]
-                    }
-                },
-                data=json.dumps(notification_data),
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims=VAPID_CLAIMS
-            )
-            
-            return {"message": "Notification sent successfully"}
-            
-        except WebPushException as e:
-            logging.error(f"Web push failed: {str(e)}")
-            # If subscription is invalid, remove it
-            if e.response and e.response.status_code in [404, 410]:
-                await db.push_subscriptions.delete_one({"session_id": session_id})
-            raise HTTPException(status_code=400, detail=f"Failed to send notification: {str(e)}")
+        outcomes = await fan_out_notification(session_id, notification_data)
+        if not outcomes:
+            raise HTTPException(status_code=404, detail="No push subscription found for this session")
+        
+        outcome = combine_push_outcomes(outcomes)
+        if outcome.status == "sent":
+            delivered = sum(1 for device_outcome in outcomes if device_outcome.status == "sent")
+            return {"message": "Notification sent successfully", "devices": len(outcomes), "delivered": delivered}
+        
+        logging.error(f"Web push {outcome.status}: {outcome.status_code} {outcome.error}")
+        raise HTTPException(status_code=400, detail=f"Failed to send notification: {outcome.error or outcome.status}")
             
     except HTTPException:
         raise
@@ -1579,10 +3685,46 @@ async def schedule_notification(notification: ScheduledNotificationCreate):
 async def get_scheduled_notifications(session_id: str):
     """Get all scheduled notifications for a session"""
     notifications = await db.scheduled_notifications.find(
-        {"session_id": session_id, "sent": False}
+        {"session_id": session_id, "sent": False, "status": {"$nin": ["dead", "skipped"]}}
     ).sort("scheduled_time", 1).to_list(100)
     return [ScheduledNotification(**notif) for notif in notifications]
 
+@api_router.get("/admin/notifications/dead-letters", response_model=List[NotificationDeadLetter])
+async def list_dead_letters(include_replayed: bool = False, limit: int = 50, current_user: User = Depends(require_admin)):
+    """List notifications that ran out of delivery attempts or hit a permanent failure"""
+    query = {} if include_replayed else {"replayed_at": None}
+    dead_letters = await db.notification_dead_letters.find(query).sort("created_at", -1).to_list(min(limit, 500))
+    return [NotificationDeadLetter(**dead_letter) for dead_letter in dead_letters]
+
+@api_router.post("/admin/notifications/dead-letters/{dead_letter_id}/replay")
+async def replay_dead_letter(dead_letter_id: str, current_user: User = Depends(require_admin)):
+    """Put a dead-lettered notification back in the queue with a fresh attempt budget"""
+    dead_letter = await db.notification_dead_letters.find_one({"id": dead_letter_id})
+    if not dead_letter:
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    if dead_letter.get("replayed_at"):
+        raise HTTPException(status_code=409, detail="Dead letter was already replayed")
+    
+    result = await db.scheduled_notifications.update_one(
+        {"id": dead_letter["notification_id"], "status": "dead"},
+        {
+            "$set": {
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": datetime.now(timezone.utc),
+                "last_error": None
+            }
+        }
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Notification is no longer dead-lettered")
+    
+    await db.notification_dead_letters.update_one(
+        {"id": dead_letter_id},
+        {"$set": {"replayed_at": datetime.now(timezone.utc)}}
+    )
+    return {"message": "Notification requeued", "notification_id": dead_letter["notification_id"]}
+
 # =====================================
 # AUTHENTICATION ENDPOINTS
 # =====================================
@@ -1650,6 +3792,7 @@ async def logout(request: Request, response: Response, current_user: User = Depe
         if session_token:
             # Remove session from database
             await db.user_sessions.delete_one({"session_token": session_token})
+            await session_user_cache.invalidate_token(session_token)
         
         # Clear cookie
         response.delete_cookie(
@@ -1674,7 +3817,7 @@ async def register_manual_user(user_data: UserRegister, response: Response):
             raise HTTPException(status_code=400, detail="Email already exists")
         
         # Hash password
-        password_hash = hash_password(user_data.password)
+        password_hash = await hash_password_async(user_data.password)
         
         # Generate username from email (use email prefix as display name)
         email_username = user_data.email.split('@')[0]
@@ -1705,6 +3848,7 @@ async def register_manual_user(user_data: UserRegister, response: Response):
         # Store session
         session_dict = session.dict()
         await db.user_sessions.insert_one(session_dict)
+        await session_user_cache.invalidate_token(session_token)
         
         # Set secure HttpOnly cookie
         response.set_cookie(
@@ -1744,7 +3888,7 @@ async def login_manual_user(user_data: UserLogin, response: Response):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Verify password
-        if not verify_password(user_data.password, user_doc["password_hash"]):
+        if not await verify_password_async(user_data.password, user_doc["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Create user object (without password hash)
@@ -1763,6 +3907,7 @@ async def login_manual_user(user_data: UserLogin, response: Response):
         # Store session
         session_dict = session.dict()
         await db.user_sessions.insert_one(session_dict)
+        await session_user_cache.invalidate_token(session_token)
         
         # Set secure HttpOnly cookie
         response.set_cookie(
@@ -1791,20 +3936,6 @@ async def login_manual_user(user_data: UserLogin, response: Response):
 @api_router.post("/career/goals", response_model=CareerGoal)
 async def create_career_goal(goal: CareerGoalCreate):
     try:
-        # Generate action plan using Donna with enhanced prompt
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id="career_planning",
-            system_message="""You are Donna, an elite career strategist like Donna Paulsen from Suits. You're sharp, strategic, and give actionable advice that gets results. 
-
-Create a precise 5-step action plan that's specific to the user's goal. Each step should be:
-1. Actionable and specific (not generic advice)
-2. Include strategic insights that most people miss
-3. Focus on leverage and smart positioning
-
-Format your response as exactly 5 numbered steps, each 2-3 sentences max. Be direct and strategic."""
-        ).with_model("openai", "gpt-4o-mini")
-        
         # Enhanced prompt based on goal analysis
         goal_lower = goal.goal.lower()
         context = ""
@@ -1824,8 +3955,12 @@ Context: {context}
 
 Create a strategic 5-step action plan that's specific to this exact goal. Focus on high-leverage activities that create momentum and visibility. Be sharp and actionable, not generic."""
 
-        user_msg = UserMessage(text=prompt)
-        action_plan_response = await chat.send_message(user_msg)
+        # Generate action plan using Donna with enhanced prompt
+        try:
+            action_plan_response = await llm_gateway.complete("career_plan", prompt)
+        except (LlmUnavailableError, asyncio.TimeoutError):
+            # Model unavailable or too slow: the fallback steps below take over
+            action_plan_response = ""
         
         print(f"✅ Generated action plan for goal '{goal.goal}': {action_plan_response}")
         
@@ -1881,6 +4016,8 @@ Create a strategic 5-step action plan that's specific to this exact goal. Focus
         
         return goal_obj
         
+    except LlmOverloadedError as e:
+        raise llm_overloaded_exception(e)
     except Exception as e:
         print(f"❌ Error creating career goal: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create career goal: {str(e)}")
@@ -1928,35 +4065,17 @@ async def create_health_entry(entry: HealthEntryCreate):
 
 @api_router.get("/health/entries", response_model=List[HealthEntry])
 async def get_health_entries(current_user: User = Depends(require_auth)):
-    entries = await db.health_entries.find().to_list(100)
+    # Newest first; legacy date-only rows are converted by the legacy_health_datetimes migration
+    entries = await db.health_entries.find(
+        {"datetime_utc": {"$exists": True}}
+    ).sort("datetime_utc", -1).to_list(100)
+
     result = []
-    
     for entry in entries:
-        # Handle both old and new data formats
-        if 'datetime_utc' not in entry:
-            # Old format: convert date to datetime_utc
-            if 'date' in entry:
-                try:
-                    # Create datetime from date, assume 12:00 UTC for old data
-                    date_str = entry['date']
-                    datetime_str = f"{date_str}T12:00:00"
-                    entry['datetime_utc'] = datetime.fromisoformat(datetime_str).replace(tzinfo=timezone.utc)
-                except:
-                    # Skip invalid entries
-                    continue
-            else:
-                # Skip entries without proper date
-                continue
-        
         try:
             result.append(HealthEntry(**entry))
         except Exception as e:
-            # Skip invalid entries
-            print(f"Skipping invalid health entry: {e}")
-            continue
-    
-    # Sort by datetime_utc (newest first)
-    result.sort(key=lambda x: x.datetime_utc, reverse=True)
+            logging.warning(f"Skipping invalid health entry {entry.get('id')}: {e}")
     return result
 
 @api_router.post("/health/goals", response_model=HealthGoal)
@@ -2203,18 +4322,14 @@ async def undo_last_health_entry(session_id: str, entry_type: str):
     today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
     
     # Find the most recent health entry of this type for today and this session
-    # Note: datetime_utc is stored as ISO string, so we need to compare against strings
-    start_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc).isoformat()
-    end_of_day = (datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)).isoformat()
+    start_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    end_of_day = datetime.strptime(today, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
     
     recent_entry = await db.health_entries.find_one(
         {
             "type": entry_type,
             "session_id": session_id,
-            "datetime_utc": {
-                "$gte": start_of_day,
-                "$lt": end_of_day
-            }
+            **time_condition("datetime_utc", gte=start_of_day, lt=end_of_day)
         },
         sort=[("datetime_utc", -1)]
     )
@@ -2238,8 +4353,8 @@ async def undo_last_health_entry(session_id: str, entry_type: str):
             update_data["$inc"] = {"hydration": -hydration_amount}
             
     elif entry_type == "meal" and entry_data.description:
-        # Recalculate meal stats by reprocessing remaining entries
-        await recalculate_meal_stats(session_id, today)
+        # Subtract the stored nutrition (or recalculate from the remaining entries)
+        await remove_meal_from_stats(session_id, today, entry_data)
         return {"message": f"Last {entry_type} entry undone successfully", "recalculated": True}
         
     elif entry_type == "sleep":
@@ -2268,29 +4383,36 @@ async def undo_last_health_entry(session_id: str, entry_type: str):
     
     return {"message": f"Last {entry_type} entry undone successfully", "entry_removed": recent_entry["description"]}
 
+def stored_meal_nutrition(entry: dict) -> Tuple[int, int]:
+    """Calories and protein stored on a meal entry (legacy entries only carry calories in value)"""
+    calories = entry.get("calories")
+    if calories is None:
+        value = str(entry.get("value") or "")
+        calories = int(value) if value.isdigit() else 0
+    return calories, entry.get("protein") or 0
+
 async def recalculate_meal_stats(session_id: str, date: str):
-    """Recalculate meal calories and protein from remaining entries"""
-    start_date = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc).isoformat()
-    end_date = (datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)).isoformat()
+    """Recalculate meal calories and protein from the nutrition stored on remaining entries"""
+    start_date = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    end_date = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
     
     # Get all remaining meal entries for today and this session
-    meal_entries = await db.health_entries.find({
-        "type": "meal",
-        "session_id": session_id,
-        "datetime_utc": {"$gte": start_date, "$lt": end_date}
-    }).to_list(100)
+    meal_entries = await db.health_entries.find(
+        {
+            "type": "meal",
+            "session_id": session_id,
+            **time_condition("datetime_utc", gte=start_date, lt=end_date)
+        },
+        {"calories": 1, "protein": 1, "value": 1}
+    ).to_list(None)
     
-    # Recalculate totals using LLM processing
     total_calories = 0
     total_protein = 0
     
     for entry in meal_entries:
-        # Re-process each meal description to get accurate totals
-        if entry.get("description"):
-            health_result = await process_health_message(f"I ate {entry['description']}")
-            if health_result.detected and health_result.message_type == "meal":
-                total_calories += health_result.calories or 0
-                total_protein += health_result.protein or 0
+        calories, protein = stored_meal_nutrition(entry)
+        total_calories += calories
+        total_protein += protein
     
     # Update daily stats with recalculated values
     await db.daily_health_stats.update_one(
@@ -2304,6 +4426,404 @@ async def recalculate_meal_stats(session_id: str, date: str):
         }
     )
 
+async def remove_meal_from_stats(session_id: str, date: str, entry: HealthEntry):
+    """Subtract a removed meal's nutrition from the day's totals without calling the LLM"""
+    if entry.calories is None and entry.protein is None:
+        # Logged before nutrition was stored on the entry
+        await recalculate_meal_stats(session_id, date)
+        return
+    
+    await db.daily_health_stats.update_one(
+        {"session_id": session_id, "date": date},
+        {
+            "$inc": {"calories": -(entry.calories or 0), "protein": -(entry.protein or 0)},
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        }
+    )
+
+# =====================================
+# DATA MIGRATIONS
+# =====================================
+
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '200'))
+# Rows another writer changed between a batch's read and its write are re-read and converted again
+MIGRATION_WRITE_ATTEMPTS = 3
+# A migration is leased to one worker (replica) at a time; the lease is renewed while it runs and a
+# crashed worker's migration can be taken over once it lapses
+MIGRATION_LEASE_SECONDS = int(os.environ.get('MIGRATION_LEASE_SECONDS', '300'))
+MIGRATION_WAIT_SECONDS = 5  # how often startup checks on a migration another worker is running
+
+class MigrationLeaseLost(Exception):
+    """Another worker took over this migration (our lease lapsed)"""
+
+async def claim_migration(name: str, restart: bool = False) -> Optional[Dict[str, Any]]:
+    """Atomically lease a migration to this worker; None while another worker holds it"""
+    now = datetime.now(timezone.utc)
+    update = {
+        "$set": {"status": "running", "owner": DISPATCHER_WORKER_ID, "started_at": now,
+                 "lease_until": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)},
+        "$setOnInsert": {"migrated": 0, "skipped": 0, "failed": 0, "conflicts": 0}
+    }
+    if restart:
+        update["$set"].update({"migrated": 0, "skipped": 0, "failed": 0, "conflicts": 0})
+        update["$unset"] = {"last_id": ""}
+        del update["$setOnInsert"]
+    try:
+        return await db.migrations.find_one_and_update(
+            {"name": name, "$or": [
+                {"status": {"$ne": "running"}},
+                {"lease_until": {"$lte": now}},
+                {"owner": DISPATCHER_WORKER_ID}
+            ]},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The row exists but didn't match: someone else holds a live lease
+        return None
+
+async def renew_migration_lease(name: str):
+    result = await db.migrations.update_one(
+        {"name": name, "owner": DISPATCHER_WORKER_ID, "status": "running"},
+        {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=MIGRATION_LEASE_SECONDS)}}
+    )
+    if result.matched_count == 0:
+        raise MigrationLeaseLost(name)
+
+async def run_document_migration(name: str, collection, query: Dict[str, Any], convert, batch_size: int = MIGRATION_BATCH_SIZE,
+                                 restart: bool = False) -> Dict[str, Any]:
+    """Rewrite matching documents in _id order with bulk_write, checkpointing after every batch
+    
+    convert(doc) returns a Mongo update document, or None to leave the document alone.
+    An update may carry a "match" dict of extra filter conditions: the write then only
+    lands if the document still holds what the conversion read (compare-and-set against
+    live writers such as the notification dispatcher). Documents whose conversion raises
+    are recorded in migration_failures; ones still conflicting after MIGRATION_WRITE_ATTEMPTS
+    are counted as conflicts. Re-running a migration resumes after the last checkpointed _id
+    (restart=True starts over).
+    
+    Only the worker holding the migration's lease in db.migrations runs it; elsewhere this
+    returns the progress without touching any documents.
+    """
+    progress = await claim_migration(name, restart=restart)
+    if progress is None:
+        logging.info(f"Migration {name} is running on another worker")
+        return await get_migration_progress(name)
+    last_id = progress.get("last_id")
+    renewed_at = time.monotonic()
+    
+    async def hold_lease():
+        nonlocal renewed_at
+        if time.monotonic() - renewed_at > MIGRATION_LEASE_SECONDS / 2:
+            await renew_migration_lease(name)
+            renewed_at = time.monotonic()
+    
+    try:
+        while True:
+            batch_query = dict(query)
+            if last_id is not None:
+                batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+            
+            batch = await collection.find(batch_query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            
+            docs = batch
+            failures = []
+            migrated = skipped = conflicts = 0
+            for attempt in range(MIGRATION_WRITE_ATTEMPTS):
+                operations = []
+                written_ids = []
+                for doc in docs:
+                    await hold_lease()
+                    try:
+                        update = await convert(doc)
+                    except Exception as e:
+                        failures.append({
+                            "migration": name,
+                            "document_id": doc["_id"],
+                            "error": str(e),
+                            "created_at": datetime.now(timezone.utc)
+                        })
+                        continue
+                    if update:
+                        match = update.pop("match", {})
+                        operations.append(UpdateOne({"_id": doc["_id"], **match}, update))
+                        written_ids.append(doc["_id"])
+                    else:
+                        skipped += 1
+                
+                if not operations:
+                    break
+                result = await collection.bulk_write(operations, ordered=False)
+                migrated += result.matched_count
+                conflicts = len(operations) - result.matched_count
+                if not conflicts or attempt == MIGRATION_WRITE_ATTEMPTS - 1:
+                    break
+                # Someone else wrote to these between our read and write; convert what's there now
+                docs = await collection.find(
+                    {"$and": [query, {"_id": {"$in": written_ids}}]}
+                ).sort("_id", 1).to_list(len(written_ids))
+                conflicts = len(docs)
+                if not docs:
+                    break
+            
+            if failures:
+                await db.migration_failures.insert_many(failures)
+            if conflicts:
+                logging.warning(f"Migration {name}: {conflicts} document(s) kept changing under it; restart the migration to retry them")
+            
+            last_id = batch[-1]["_id"]
+            now = datetime.now(timezone.utc)
+            checkpoint = await db.migrations.update_one(
+                {"name": name, "owner": DISPATCHER_WORKER_ID},
+                {
+                    "$set": {"last_id": last_id, "updated_at": now, "lease_until": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)},
+                    "$inc": {"migrated": migrated, "skipped": skipped, "failed": len(failures), "conflicts": conflicts}
+                }
+            )
+            if checkpoint.matched_count == 0:
+                raise MigrationLeaseLost(name)
+            renewed_at = time.monotonic()
+        
+        await db.migrations.update_one(
+            {"name": name, "owner": DISPATCHER_WORKER_ID},
+            {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc)}, "$unset": {"owner": "", "lease_until": ""}}
+        )
+    except MigrationLeaseLost:
+        logging.warning(f"Migration {name}: lease lapsed and another worker took over; stopping here")
+    except Exception as e:
+        logging.error(f"Migration {name} stopped: {str(e)}")
+        await db.migrations.update_one(
+            {"name": name, "owner": DISPATCHER_WORKER_ID},
+            {"$set": {"status": "interrupted", "error": str(e)}, "$unset": {"owner": "", "lease_until": ""}}
+        )
+    
+    return await get_migration_progress(name)
+
+async def get_migration_progress(name: str) -> Dict[str, Any]:
+    progress = await db.migrations.find_one({"name": name}, {"_id": 0, "last_id": 0})
+    return progress or {"name": name, "status": "not_started"}
+
+async def backfill_meal_nutrition(doc: dict) -> Optional[Dict[str, Any]]:
+    """Store typed calories/protein on a meal entry logged before they were kept"""
+    calories, _ = stored_meal_nutrition(doc)
+    protein = 0
+    
+    # Protein was never stored, so extract it once from the description. A model error raises
+    # (strict) so the row lands in migration_failures and a restart retries it, instead of
+    # storing zeros the migration's query would never pick up again
+    if doc.get("description"):
+        health_result = await process_health_message(f"I ate {doc['description']}", strict=True)
+        if health_result.detected and health_result.message_type == "meal":
+            calories = calories or health_result.calories or 0
+            protein = health_result.protein or 0
+    
+    return {"$set": {"calories": calories, "protein": protein}}
+
+async def backfill_notification_delivery_state(doc: dict) -> Optional[Dict[str, Any]]:
+    """Give a notification written before the delivery state machine its status and due time"""
+    # Only while the dispatcher hasn't picked the row up since we read it
+    match = {"status": doc.get("status"), "next_attempt_at": None}
+    if doc.get("sent"):
+        return {"$set": {"status": "delivered", "attempts": doc.get("attempts", 0), "next_attempt_at": None}, "match": match}
+    if doc.get("status") == "in_flight" and doc.get("lease_until"):
+        # Claimed under the old lease field; due again when that lease runs out
+        return {"$set": {"next_attempt_at": parse_stored_datetime(doc["lease_until"])}, "$unset": {"lease_until": ""}, "match": match}
+    return {
+        "$set": {"status": "pending", "attempts": doc.get("attempts", 0), "next_attempt_at": parse_stored_datetime(doc["scheduled_time"])},
+        "$unset": {"lease_until": "", "claimed_by": ""},
+        "match": match
+    }
+
+async def move_calendar_reminder(doc: dict) -> Optional[Dict[str, Any]]:
+    """Replace a legacy calendar_reminders row with the gift policy's scheduled notifications
+    
+    The gift flow used to write its 7-day reminder to calendar_reminders (which nothing
+    dispatched) and link it by the event's ObjectId. The event gets the gift reminder
+    policy, and its still-future reminders are scheduled like any new gift event's.
+    """
+    event_id = doc["event_id"]
+    event_query = {"_id": ObjectId(event_id)} if ObjectId.is_valid(event_id) else {"id": event_id}
+    event = await db.calendar_events.find_one(event_query)
+    if not event:
+        return {"$set": {"migrated_at": datetime.now(timezone.utc), "migrated_event_id": None}}
+    
+    await db.calendar_events.update_one({"_id": event["_id"]}, {"$set": {"reminder_policy": "gift"}})
+    event_obj = CalendarEvent(**{**event, "reminder_policy": "gift"})
+    if event_obj.reminder:
+        reminders = build_event_reminders(event_obj.session_id, event_obj.id, event_obj.title, event_obj.datetime_utc, "gift")
+        await insert_scheduled_notifications(reminders)
+    
+    return {"$set": {"migrated_at": datetime.now(timezone.utc), "migrated_event_id": event_obj.id}}
+
+def legacy_datetime_utc(date_str: Optional[str], time_str: Optional[str]) -> datetime:
+    """datetime_utc for a row stored as separate date and time strings (assumed UTC)"""
+    if not date_str:
+        raise ValueError("No date to convert")
+    return datetime.fromisoformat(f"{date_str}T{time_str or '12:00'}").replace(tzinfo=timezone.utc)
+
+async def convert_legacy_event(doc: dict) -> Optional[Dict[str, Any]]:
+    update = {"datetime_utc": legacy_datetime_utc(doc.get("date"), doc.get("time"))}
+    # Only if nobody converted (or edited) the event since we read it
+    match = {"datetime_utc": {"$exists": False}, "date": doc.get("date"), "time": doc.get("time")}
+    if not doc.get("id"):
+        # Keyset pagination and reminders both key on the event id; never hand out a second one
+        update["id"] = str(uuid.uuid4())
+        match["id"] = {"$exists": False}
+    return {"$set": update, "match": match}
+
+async def convert_legacy_health_entry(doc: dict) -> Optional[Dict[str, Any]]:
+    # Old health entries only had a date; they were shown at noon UTC
+    return {"$set": {"datetime_utc": legacy_datetime_utc(doc.get("date"), "12:00")}}
+
+# Timestamp fields that older versions stored as ISO strings, by collection
+DATE_FIELDS = {
+    "calendar_events": ["datetime_utc", "created_at"],
+    "health_entries": ["datetime_utc", "created_at"],
+    "scheduled_notifications": ["scheduled_time", "next_attempt_at", "claimed_at", "sent_at", "created_at"],
+    "notification_dead_letters": ["created_at", "replayed_at"],
+    "push_subscriptions": ["created_at", "updated_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "users": ["created_at", "updated_at"],
+    "chat_messages": ["timestamp"],
+    "conversation_context": ["created_at"],
+    "career_goals": ["created_at"],
+    "health_goals": ["created_at"],
+    "health_targets": ["created_at", "updated_at"],
+    "daily_health_stats": ["created_at", "updated_at"],
+    "weekly_health_analytics": ["created_at"],
+    "user_settings": ["created_at", "updated_at"],
+    "telemetry_logs": ["created_at"],
+    "calendar_reminders": ["migrated_at"],
+}
+
+def native_dates_converter(fields: List[str]):
+    async def convert(doc: dict) -> Optional[Dict[str, Any]]:
+        """Rewrite a document's ISO-string timestamps as BSON dates
+        
+        Only while each field still holds the string that was read: a live writer (say the
+        dispatcher claiming a notification) may have set a fresh value since.
+        """
+        update, match = {}, {}
+        for field in fields:
+            value = doc.get(field)
+            if isinstance(value, str):
+                parsed = parse_stored_datetime(value)
+                if parsed is None:
+                    raise ValueError(f"Unparseable {field}: {value!r}")
+                update[field] = parsed
+                match[field] = value
+        return {"$set": update, "match": match} if update else None
+    return convert
+
+MIGRATIONS = {
+    "meal_nutrition": {
+        "collection": "health_entries",
+        "query": {"type": "meal", "calories": {"$exists": False}},
+        "convert": backfill_meal_nutrition
+    },
+    "notification_delivery_state": {
+        "collection": "scheduled_notifications",
+        "query": {"$or": [
+            {"status": {"$exists": False}},
+            {"status": {"$in": FRESH_NOTIFICATION_STATUSES}, "next_attempt_at": None}
+        ]},
+        "convert": backfill_notification_delivery_state
+    },
+    "calendar_reminders": {
+        "collection": "calendar_reminders",
+        "query": {"migrated_at": {"$exists": False}},
+        "convert": move_calendar_reminder
+    },
+    "legacy_event_datetimes": {
+        "collection": "calendar_events",
+        "query": {"datetime_utc": {"$exists": False}},
+        "convert": convert_legacy_event
+    },
+    "legacy_health_datetimes": {
+        "collection": "health_entries",
+        "query": {"datetime_utc": {"$exists": False}},
+        "convert": convert_legacy_health_entry
+    }
+}
+
+for collection_name, fields in DATE_FIELDS.items():
+    MIGRATIONS[f"native_dates_{collection_name}"] = {
+        "collection": collection_name,
+        "query": {"$or": [{field: {"$type": "string"}} for field in fields]},
+        "convert": native_dates_converter(fields)
+    }
+
+# Run (or resume) at every startup, in this order (run_startup_migrations); they only touch
+# rows that still need converting
+STARTUP_MIGRATIONS = [
+    "legacy_event_datetimes",
+    "calendar_reminders",
+    "legacy_health_datetimes",
+    "notification_delivery_state",
+    *(f"native_dates_{collection_name}" for collection_name in DATE_FIELDS)
+]
+
+running_migrations: Dict[str, asyncio.Task] = {}
+startup_migrations_task: Optional[asyncio.Task] = None
+
+def start_migration(name: str, restart: bool = False) -> bool:
+    """Start a registered migration in the background; False if it is already running"""
+    if name in running_migrations and not running_migrations[name].done():
+        return False
+    
+    spec = MIGRATIONS[name]
+    
+    running_migrations[name] = asyncio.create_task(
+        run_document_migration(name, db[spec["collection"]], spec["query"], spec["convert"], restart=restart)
+    )
+    return True
+
+def migration_held_elsewhere(progress: Optional[Dict[str, Any]]) -> bool:
+    if not progress or progress.get("status") != "running" or progress.get("owner") == DISPATCHER_WORKER_ID:
+        return False
+    lease_until = parse_stored_datetime(progress.get("lease_until"))
+    return lease_until is not None and lease_until > datetime.now(timezone.utc)
+
+async def run_startup_migrations():
+    """Run STARTUP_MIGRATIONS one at a time, in list order
+    
+    A migration another worker holds is waited for (and taken over if its lease lapses)
+    before moving on, so later migrations can rely on earlier ones on every replica.
+    """
+    try:
+        for name in STARTUP_MIGRATIONS:
+            while True:
+                start_migration(name)
+                await running_migrations[name]
+                if not migration_held_elsewhere(await db.migrations.find_one({"name": name})):
+                    break
+                await asyncio.sleep(MIGRATION_WAIT_SECONDS)
+    except Exception as e:
+        logging.error(f"Startup migrations stopped: {str(e)}")
+
+@api_router.post("/admin/migrations/{name}")
+async def trigger_migration(name: str, restart: bool = False, current_user: User = Depends(require_admin)):
+    """Start (or resume) a data migration in the background"""
+    if name not in MIGRATIONS:
+        raise HTTPException(status_code=404, detail="Unknown migration")
+    started = start_migration(name, restart=restart)
+    return {"name": name, "started": started, "progress": await get_migration_progress(name)}
+
+@api_router.get("/admin/migrations/{name}")
+async def get_migration_status(name: str, current_user: User = Depends(require_admin)):
+    """Report a migration's progress and the documents it could not convert"""
+    if name not in MIGRATIONS:
+        raise HTTPException(status_code=404, detail="Unknown migration")
+    failures = await db.migration_failures.find(
+        {"migration": name}, {"_id": 0}
+    ).sort("created_at", -1).to_list(50)
+    for failure in failures:
+        failure["document_id"] = str(failure["document_id"])
+    return {"progress": await get_migration_progress(name), "recent_failures": failures}
+
 # Weekly Analytics Functions
 async def get_week_bounds(week_offset: int = 0):
     """Get Monday and Sunday dates for the specified week"""
@@ -2466,14 +4986,7 @@ Look for connections between sleep quality and calorie cravings, hydration patte
 Generate insights that make the user think "Wow, I never realized that connection!" Focus on actionable health impacts, not just describing the numbers.
 """
 
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id=f"weekly_analytics_{session_id}",
-            system_message=WEEKLY_ANALYTICS_SYSTEM_MESSAGE
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_msg = UserMessage(text=context)
-        llm_response = await chat.send_message(user_msg)
+        llm_response = await llm_gateway.complete("weekly_analytics", context, session_id=f"weekly_analytics_{session_id}")
         
         # Parse JSON response
         import json
@@ -2531,37 +5044,66 @@ async def setup_event_notes_context(session_id: str, event_id: str):
     )
     await db.conversation_context.insert_one(prepare_for_mongo(context.dict()))
 
+# Enhanced event detection patterns (simplified version of frontend logic)
+EVENT_INDICATORS = [
+    'meeting', 'appointment', 'schedule', 'book', 'i have',
+    'tomorrow', 'today', 'tonight', 'next week', 'next', 'at', 'pm', 'am',
+    'doctor', 'dentist', 'gym', 'workout', 'lunch', 'dinner',
+    'birthday', 'anniversary', 'remind me', 'reminder',
+    'call', 'visit', 'party', 'celebration', 'conference'
+]
+
+EVENT_CATEGORIES = ['work', 'appointments', 'regular_activities', 'personal', 'reminders']
+
+def looks_like_event(message_lower: str) -> bool:
+    return any(indicator in message_lower for indicator in EVENT_INDICATORS)
+
+def parse_candidate_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse the extractor's ISO datetime, returning None if it is missing or invalid"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
 # Context processing function - ENHANCED to return event ID and use frontend logic
-async def process_message_context(message: str, session_id: str):
-    """Process message to auto-create calendar events, career goals, or health entries"""
+async def process_message_context(message: str, session_id: str, event_candidate: Optional[EventCandidate] = None):
+    """Process message to auto-create calendar events, career goals, or health entries
+    
+    When the unified intent extractor ran, its event slot replaces the keyword heuristics.
+    """
     message_lower = message.lower()
     current_utc = datetime.now(timezone.utc)
     created_event_id = None
     
-    # Enhanced event detection patterns (simplified version of frontend logic)
-    event_indicators = [
-        'meeting', 'appointment', 'schedule', 'book', 'i have',
-        'tomorrow', 'today', 'tonight', 'next week', 'next', 'at', 'pm', 'am',
-        'doctor', 'dentist', 'gym', 'workout', 'lunch', 'dinner',
-        'birthday', 'anniversary', 'remind me', 'reminder',
-        'call', 'visit', 'party', 'celebration', 'conference'
-    ]
+    if event_candidate is not None:
+        is_event = is_confident_event(event_candidate)
+    else:
+        is_event = looks_like_event(message_lower)
     
     # Check if this looks like an event message
-    if any(indicator in message_lower for indicator in event_indicators):
+    if is_event:
         try:
             # Simple title extraction (clean version)
             title = extract_simple_title(message)
             
-            # Simple time extraction
-            event_time = extract_simple_time(message)
-            
             # Simple date calculation
             event_date = extract_simple_date(message, current_utc)
             
             # Simple category detection
             category = detect_simple_category(message_lower)
             
+            # Prefer the extractor's slots when it filled them in
+            if event_candidate is not None:
+                title = event_candidate.title or title
+                event_date = parse_candidate_datetime(event_candidate.datetime_utc) or event_date
+                if event_candidate.category in EVENT_CATEGORIES:
+                    category = event_candidate.category
+            
             # Create the event
             event = CalendarEvent(
                 title=title,
@@ -2582,8 +5124,8 @@ async def process_message_context(message: str, session_id: str):
     else:
         print(f"🔍 No event indicators found in message: '{message}'")
     
-    # Health context detection (unchanged)
-    if any(word in message_lower for word in ['ate', 'drank', 'water', 'meal', 'sleep', 'workout']):
+    # Health context detection (the unified extractor's health slot already covered this)
+    if event_candidate is None and any(word in message_lower for word in ['ate', 'drank', 'water', 'meal', 'sleep', 'workout']):
         entry_type = 'meal' if 'ate' in message_lower or 'meal' in message_lower else 'hydration'
         if 'water' in message_lower:
             entry_type = 'hydration'
@@ -2784,6 +5326,58 @@ async def update_user_settings(session_id: str, settings_update: UserSettingsUpd
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update user settings: {str(e)}")
 
+@api_router.get("/metrics/detector-cache")
+async def get_detector_cache_metrics():
+    """Hit/miss counters for the LLM detector result cache (for debugging/monitoring)"""
+    return detector_cache.snapshot()
+
+@api_router.get("/metrics/session-cache")
+async def get_session_cache_metrics():
+    """Hit/miss counters for the session token -> user cache (for debugging/monitoring)"""
+    return session_user_cache.snapshot()
+
+@api_router.get("/metrics/notification-dispatcher")
+async def get_notification_dispatcher_metrics():
+    """Backlog and lag of the scheduled notification dispatcher (for debugging/monitoring)"""
+    current_time = datetime.now(timezone.utc)
+    return {
+        **notification_dispatcher.snapshot(),
+        "due_backlog": await db.scheduled_notifications.count_documents(due_notifications_query(current_time)),
+        "due_retries": await db.scheduled_notifications.count_documents(due_notifications_query(current_time, RETRY_NOTIFICATION_STATUSES)),
+        "dead_letters": await db.notification_dead_letters.count_documents({"replayed_at": None}),
+        "reminder_gc": reminder_gc_metrics,
+        "lag_seconds": round(await oldest_due_notification_lag(), 2)
+    }
+
+@api_router.get("/metrics/chat")
+async def get_chat_metrics():
+    """Time to first token (headline) and total latency of chat turns, by response mode"""
+    return {
+        mode: {
+            "avg_first_token_ms": round(metrics["first_token_ms"] / metrics["turns"], 2) if metrics["turns"] else 0.0,
+            "avg_total_ms": round(metrics["total_ms"] / metrics["turns"], 2) if metrics["turns"] else 0.0,
+            "turns": metrics["turns"],
+            "errors": metrics["errors"],
+            "rejected": metrics["rejected"]
+        }
+        for mode, metrics in chat_latency_metrics.items()
+    }
+
+@api_router.get("/metrics/llm-gateway")
+async def get_llm_gateway_metrics():
+    """Per-prompt call, error, timeout and latency counters of the LLM gateway (for debugging/monitoring)"""
+    return llm_gateway.snapshot()
+
+@api_router.get("/metrics/password-hashing")
+async def get_password_hashing_metrics():
+    """Queue depth and wait time of the bcrypt worker pool (for debugging/monitoring)"""
+    metrics = password_work_metrics
+    return {
+        **metrics,
+        "concurrency": PASSWORD_HASH_CONCURRENCY,
+        "avg_wait_ms": round(metrics["total_wait_ms"] / metrics["completed"], 2) if metrics["completed"] else 0.0
+    }
+
 @api_router.get("/telemetry/analytics")
 async def get_telemetry_analytics():
     """Get basic analytics from telemetry data (for debugging/monitoring)"""
@@ -2810,6 +5404,107 @@ async def get_telemetry_analytics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get analytics: {str(e)}")
 
+# =====================================
+# DATABASE INDEXES
+# =====================================
+
+# Declarative index registry, applied at startup. TTL indexes only expire
+# documents whose field is a native BSON date.
+MONGO_INDEXES = [
+    # Auth: every authenticated request looks up its session, then the user
+    {"collection": "user_sessions", "keys": [("session_token", 1), ("expires_at", 1)]},
+    {"collection": "user_sessions", "keys": [("expires_at", 1)], "options": {"expireAfterSeconds": 0}},
+    {"collection": "users", "keys": [("email", 1)], "options": {"unique": True}},
+    {"collection": "users", "keys": [("id", 1)]},
+    
+    # Chat
+    {"collection": "chat_messages", "keys": [("session_id", 1), ("timestamp", -1)]},
+    {"collection": "conversation_context", "keys": [("session_id", 1), ("waiting_for_notes", 1)]},
+    
+    # Calendar
+    {"collection": "calendar_events", "keys": [("session_id", 1), ("datetime_utc", 1), ("id", 1)]},
+    {"collection": "calendar_events", "keys": [("id", 1)]},
+    
+    # Health
+    {"collection": "daily_health_stats", "keys": [("session_id", 1), ("date", 1)], "options": {"unique": True}},
+    {"collection": "health_entries", "keys": [("session_id", 1), ("type", 1), ("datetime_utc", -1)]},
+    {"collection": "health_entries", "keys": [("id", 1)]},
+    {"collection": "health_targets", "keys": [("session_id", 1)]},
+    {"collection": "weekly_health_analytics", "keys": [("session_id", 1), ("week_start", 1), ("week_end", 1)]},
+    {"collection": "user_settings", "keys": [("session_id", 1)]},
+    
+    # Notifications
+    {"collection": "scheduled_notifications", "keys": [("id", 1), ("claimed_by", 1)]},
+    {"collection": "scheduled_notifications", "keys": [("status", 1), ("next_attempt_at", 1)]},
+    # One reminder per event and offset, so re-scheduling an event can't duplicate them
+    {"collection": "scheduled_notifications", "keys": [("event_id", 1), ("reminder_offset_hours", 1)],
+     "options": {"unique": True, "partialFilterExpression": {"reminder_offset_hours": {"$type": "number"}}}},
+    {"collection": "notification_dead_letters", "keys": [("id", 1)]},
+    {"collection": "notification_dead_letters", "keys": [("replayed_at", 1), ("created_at", -1)]},
+    {"collection": "scheduled_notifications", "keys": [("session_id", 1), ("sent", 1), ("scheduled_time", 1)]},
+    # One row per device endpoint; a session can have several devices
+    {"collection": "push_subscriptions", "keys": [("endpoint", 1)], "options": {"unique": True}},
+    {"collection": "push_subscriptions", "keys": [("session_id", 1), ("updated_at", -1)]},
+    
+    # Internal bookkeeping
+    {"collection": "llm_detector_cache", "keys": [("key", 1)], "options": {"unique": True}},
+    {"collection": "llm_detector_cache", "keys": [("expires_at", 1)], "options": {"expireAfterSeconds": 0}},
+    {"collection": "migrations", "keys": [("name", 1)], "options": {"unique": True}},
+    {"collection": "migration_failures", "keys": [("migration", 1), ("created_at", -1)]},
+]
+
+# Indexes an earlier version created that now get in the way (dropped at startup if present)
+RETIRED_MONGO_INDEXES = [
+    # Unique per session allowed only one device per user
+    {"collection": "push_subscriptions", "name": "session_id_1"},
+    # Superseded by the (status, next_attempt_at) due-time index
+    {"collection": "scheduled_notifications", "name": "sent_1_scheduled_time_1"},
+    # Prefix of the (session_id, datetime_utc, id) keyset pagination index
+    {"collection": "calendar_events", "name": "session_id_1_datetime_utc_1"},
+]
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create every index in MONGO_INDEXES (no-op for ones that already exist)"""
+    summary = {"created": [], "failed": [], "dropped": []}
+    for retired in RETIRED_MONGO_INDEXES:
+        try:
+            existing = await db[retired["collection"]].index_information()
+            if retired["name"] in existing:
+                await db[retired["collection"]].drop_index(retired["name"])
+                summary["dropped"].append(f"{retired['collection']}.{retired['name']}")
+        except OperationFailure as e:
+            logging.error(f"Failed to drop retired index {retired['collection']}.{retired['name']}: {str(e)}")
+    
+    for spec in MONGO_INDEXES:
+        label = f"{spec['collection']}({', '.join(field for field, _ in spec['keys'])})"
+        try:
+            await db[spec["collection"]].create_index(spec["keys"], **spec.get("options", {}))
+            summary["created"].append(label)
+        except Exception as e:
+            # Typically duplicate values blocking a unique index - clean up and restart
+            logging.error(f"Failed to create index {label}: {str(e)}")
+            summary["failed"].append(label)
+    
+    logging.info(f"Ensured {len(summary['created'])} indexes ({len(summary['failed'])} failed)")
+    return summary
+
+@api_router.get("/admin/indexes")
+async def get_index_usage(current_user: User = Depends(require_admin)):
+    """Report how often each index has been used since the server last started"""
+    usage = {}
+    for collection_name in sorted({spec["collection"] for spec in MONGO_INDEXES}):
+        stats = await db[collection_name].aggregate([{"$indexStats": {}}]).to_list(None)
+        usage[collection_name] = [
+            {
+                "name": stat["name"],
+                "key": stat["key"],
+                "ops": stat["accesses"]["ops"],
+                "since": stat["accesses"]["since"]
+            }
+            for stat in stats
+        ]
+    return usage
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -2823,6 +5518,7 @@ app.add_middleware(
     ],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -2832,6 +5528,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def start_startup_migrations():
+    global startup_migrations_task
+    # In the background, so serving doesn't wait on them; one after another inside
+    startup_migrations_task = asyncio.create_task(run_startup_migrations())
+
+@app.on_event("startup")
+async def log_llm_transport():
+    if not llm_gateway.base_url:
+        logging.info("LLM_BASE_URL not set: model calls go through LlmChat with a new client per call (no connection pooling)")
+
+@app.on_event("startup")
+async def start_notification_dispatcher():
+    global reminder_gc_task
+    if NOTIFICATION_DISPATCHER_ENABLED:
+        notification_dispatcher.start()
+        reminder_gc_task = asyncio.create_task(run_reminder_gc())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await notification_dispatcher.stop()
+    if reminder_gc_task is not None:
+        reminder_gc_task.cancel()
+    if startup_migrations_task is not None:
+        startup_migrations_task.cancel()
+    client.close()
+    password_executor.shutdown(wait=False)
+    await push_engine.close()
+    await llm_gateway.close()
\ No newline at end of file
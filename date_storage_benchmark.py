@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Range-query and deserialize cost: ISO-string timestamps vs native BSON dates
+
+Loads the same synthetic health entries into two scratch collections, one written
+the old way (datetimes as ISO strings) and one through the current prepare_for_mongo
+(native dates), each with a (session_id, datetime_utc) index. Then times a
+one-week range query per user, the HealthEntry parse of the results, and reports
+index sizes. Needs a reachable MongoDB (MONGO_URL, default localhost); the scratch
+database is dropped afterwards.
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pymongo import MongoClient
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "donna_date_storage_benchmark")
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from server import HealthEntry, prepare_for_mongo  # noqa: E402
+
+SESSIONS = 50
+ENTRIES_PER_SESSION = 2000
+QUERIES = 300
+BENCH_DB = "donna_date_storage_benchmark"
+
+def legacy_prepare_for_mongo(data):
+    """The old codec: top-level datetimes become ISO strings"""
+    for key, value in data.items():
+        if isinstance(value, datetime):
+            data[key] = value.isoformat()
+    return data
+
+def make_entries():
+    now = datetime.now(timezone.utc)
+    for session in range(SESSIONS):
+        session_id = f"bench-{session}"
+        for _ in range(ENTRIES_PER_SESSION):
+            yield HealthEntry(
+                type=random.choice(["meal", "hydration", "sleep"]),
+                description="benchmark entry",
+                value=str(random.randint(100, 900)),
+                session_id=session_id,
+                datetime_utc=now - timedelta(minutes=random.randint(0, 365 * 24 * 60))
+            )
+
+def load(collection, entries, codec):
+    collection.insert_many([codec(entry.dict()) for entry in entries], ordered=False)
+    collection.create_index([("session_id", 1), ("datetime_utc", 1)])
+
+def measure(collection, as_string):
+    now = datetime.now(timezone.utc)
+    query_ms, parse_ms, rows = [], [], 0
+    for _ in range(QUERIES):
+        start = now - timedelta(days=random.randint(7, 360))
+        end = start + timedelta(days=7)
+        bounds = {"$gte": start, "$lt": end}
+        if as_string:
+            bounds = {op: value.isoformat() for op, value in bounds.items()}
+
+        t0 = time.perf_counter()
+        docs = list(collection.find({"session_id": f"bench-{random.randrange(SESSIONS)}", "datetime_utc": bounds}))
+        t1 = time.perf_counter()
+        entries = [HealthEntry(**doc) for doc in docs]
+        t2 = time.perf_counter()
+
+        query_ms.append((t1 - t0) * 1000)
+        parse_ms.append((t2 - t1) * 1000)
+        rows += len(entries)
+    return statistics.median(query_ms), statistics.median(parse_ms), rows / QUERIES
+
+def index_size_kb(database, name):
+    stats = database.command("collStats", name)
+    return stats["indexSizes"].get("session_id_1_datetime_utc_1", 0) / 1024
+
+def main():
+    client = MongoClient(os.environ["MONGO_URL"], tz_aware=True, tzinfo=timezone.utc)
+    database = client[f"{BENCH_DB}_{uuid.uuid4().hex[:6]}"]
+    try:
+        entries = list(make_entries())
+        print(f"📦 Loading {len(entries)} entries into each collection...")
+        load(database.iso_strings, entries, legacy_prepare_for_mongo)
+        load(database.native_dates, entries, prepare_for_mongo)
+
+        print(f"\n📊 One-week range query per user, median of {QUERIES}")
+        print(f"   {'storage':<14} {'query':>9} {'parse':>9} {'rows':>6} {'index':>10}")
+        for name, as_string in (("iso_strings", True), ("native_dates", False)):
+            query, parse, rows = measure(database[name], as_string)
+            print(f"   {name:<14} {query:>7.2f}ms {parse:>7.2f}ms {rows:>6.0f} {index_size_kb(database, name):>8.0f}KB")
+    finally:
+        client.drop_database(database.name)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,7 @@ import {
   splitUTCDateTime, 
   formatInUserTimezone, 
   getCurrentInUserTimezone,
+  getUserTimezone,
   handleDSTTransition,
   parseISO,
   isToday
@@ -39,15 +40,67 @@ const API = `${BACKEND_URL}/api`;
 // Configure axios to include credentials with all requests
 axios.defaults.withCredentials = true;
 
+// Send a chat message through /chat/stream, calling onReply with the text so far as
+// Donna's reply streams in (Server-Sent Events). Resolves with the full reply.
+const streamChatMessage = async (payload, onReply) => {
+  const response = await fetch(`${API}/chat/stream`, {
+    method: 'POST',
+    credentials: 'include',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(payload)
+  });
+  if (!response.ok) {
+    throw new Error(`Chat failed with status ${response.status}`);
+  }
+  if (!response.body || !(response.headers.get('content-type') || '').includes('text/event-stream')) {
+    // Server answered with plain JSON (same shape as POST /chat)
+    const data = await response.json();
+    onReply(data.response);
+    return data.response;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let reply = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const eventLine = rawEvent.match(/^event: (.*)$/m);
+      const dataLine = rawEvent.match(/^data: (.*)$/m);
+      const data = dataLine ? JSON.parse(dataLine[1]) : {};
+
+      if (eventLine && eventLine[1] === 'token') {
+        reply += data.text;
+        onReply(reply);
+      } else if (eventLine && eventLine[1] === 'done') {
+        return data.response;
+      } else if (eventLine && eventLine[1] === 'error') {
+        throw new Error(data.detail);
+      }
+    }
+  }
+  return reply;
+};
+
 const App = () => {
   // Chat state
   const [messages, setMessages] = useState([]);
   const [inputMessage, setInputMessage] = useState('');
   const [isVoiceRecording, setIsVoiceRecording] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
+  const [isReplyStreaming, setIsReplyStreaming] = useState(false);
   
   // Calendar state
-  const [events, setEvents] = useState([]);
+  const [events, setEvents] = useState([]); // Today and the next two days, for the upcoming view
+  const [monthEvents, setMonthEvents] = useState([]); // The month shown in the monthly view
+  const [calendarMonth, setCalendarMonth] = useState(() => new Date());
   const [newEvent, setNewEvent] = useState({ title: '', description: '', date: '', time: '' });
   
   // Career state
@@ -196,6 +249,7 @@ const App = () => {
     // SECURITY: Clear any preview/unauthenticated data before loading user's data
     setMessages([]);
     setEvents([]);
+    setMonthEvents([]);
     setCareerGoals([]);
     setHealthStats({ calories: 0, protein: 0, hydration: 0, sleep: 0 });
     
@@ -220,6 +274,7 @@ const App = () => {
       // Clear app data
       setMessages([]);
       setEvents([]);
+      setMonthEvents([]);
       setCareerGoals([]);
       setHealthStats({ calories: 0, protein: 0, hydration: 0, sleep: 0 });
     }
@@ -272,20 +327,16 @@ const App = () => {
         }
       }
       
-      // Send message to Donna with context about event creation
-      const response = await axios.post(`${API}/chat`, {
+      // Send message to Donna with context about event creation; her reply is
+      // shown as it streams in
+      const showReply = createReplyRenderer();
+      const reply = await streamChatMessage({
         message: inputMessage,
         event_created: eventCreated // Let Donna know if an event was created
-      });
+      }, showReply);
       
-      // Add Donna's response to chat
-      if (response.data && response.data.response) {
-        const donnaMessage = {
-          message: response.data.response,
-          is_user: false,
-          timestamp: new Date().toISOString()
-        };
-        setMessages(prev => [...prev, donnaMessage]);
+      if (reply) {
+        showReply(reply);
       }
       
       setInputMessage('');
@@ -302,9 +353,29 @@ const App = () => {
       console.error('Error sending message:', error);
     } finally {
       setIsLoading(false);
+      setIsReplyStreaming(false);
     }
   };
 
+  // Returns a callback that adds Donna's reply to the chat on its first call and
+  // updates that same message on every later call
+  const createReplyRenderer = () => {
+    let replyStarted = false;
+    return (text) => {
+      const isFirstChunk = !replyStarted;
+      replyStarted = true;
+      if (isFirstChunk) {
+        setIsReplyStreaming(true);
+      }
+      const donnaMessage = {
+        message: text,
+        is_user: false,
+        timestamp: new Date().toISOString()
+      };
+      setMessages(prev => isFirstChunk ? [...prev, donnaMessage] : [...prev.slice(0, -1), donnaMessage]);
+    };
+  };
+
   // Auto-send function for example cards
   const autoSendExample = async (exampleText) => {
     if (isLoading) return;
@@ -320,18 +391,10 @@ const App = () => {
       };
       setMessages(prev => [...prev, userMessage]);
 
-      // Send to backend
-      const response = await axios.post(`${API}/chat`, {
-        message: exampleText
-      });
-      
-      // Add Donna's response
-      const donnaMessage = {
-        message: response.data.response,
-        is_user: false,
-        timestamp: new Date().toISOString()
-      };
-      setMessages(prev => [...prev, donnaMessage]);
+      // Send to backend, showing Donna's response as it streams in
+      const showReply = createReplyRenderer();
+      const reply = await streamChatMessage({ message: exampleText }, showReply);
+      showReply(reply);
       
       // Refresh other tabs data if context might have changed
       await loadEvents();
@@ -347,6 +410,7 @@ const App = () => {
       setMessages(prev => [...prev, errorMessage]);
     } finally {
       setIsLoading(false);
+      setIsReplyStreaming(false);
     }
   };
 
@@ -523,19 +587,59 @@ const App = () => {
   };
 
   // Calendar functions
+  // One day, week or month of events (YYYY-MM-DD anchor, user's timezone), trimmed to the
+  // fields that view renders; X-Next-Cursor only shows up for unusually busy windows
+  const loadCalendarView = async (view, date) => {
+    const viewEvents = [];
+    let after = null;
+    do {
+      const response = await axios.get(`${API}/calendar/events`, {
+        params: { view, date, tz: getUserTimezone(), limit: 500, ...(after ? { after } : {}) }
+      });
+      viewEvents.push(...response.data);
+      after = response.headers['x-next-cursor'] || null;
+    } while (after);
+    return viewEvents;
+  };
+
+  const loadMonthEvents = async (month = calendarMonth) => {
+    try {
+      const anchor = `${month.getFullYear()}-${String(month.getMonth() + 1).padStart(2, '0')}-01`;
+      setMonthEvents(await loadCalendarView('month', anchor));
+    } catch (error) {
+      console.error('Error loading month events:', error);
+    }
+  };
+
   const loadEvents = async () => {
     try {
-      const response = await axios.get(`${API}/calendar/events`);
-      const allEvents = response.data;
-      
-      console.log('DEBUG: API response:', response.data);
-      console.log('DEBUG: Events count:', allEvents.length);
-      
-      // DEBUG: Show ALL events without any filtering
-      setEvents(allEvents);
+      // Upcoming view: today plus the two days SmartSuggestions looks ahead
+      const days = [0, 1, 2].map(offset =>
+        formatInUserTimezone(new Date(Date.now() + offset * 24 * 60 * 60 * 1000), 'yyyy-MM-dd')
+      );
+      const pages = await Promise.all(days.map(day => loadCalendarView('day', day)));
+      setEvents(pages.flat());
     } catch (error) {
       console.error('Error loading events:', error);
     }
+    await loadMonthEvents();
+  };
+
+  // The month grid only carries what it draws; fetch the event's day for the full card
+  const loadEventDetails = async (event) => {
+    try {
+      const dayEvents = await loadCalendarView('day', formatInUserTimezone(event.datetime_utc, 'yyyy-MM-dd'));
+      return dayEvents.find(e => e.id === event.id) || event;
+    } catch (error) {
+      console.error('Error loading event details:', error);
+      return event;
+    }
+  };
+
+  const navigateCalendarMonth = (direction) => {
+    const month = new Date(calendarMonth.getFullYear(), calendarMonth.getMonth() + direction, 1);
+    setCalendarMonth(month);
+    loadMonthEvents(month);
   };
 
   const createEvent = async () => {
@@ -1678,7 +1782,7 @@ const App = () => {
                       </div>
                     </div>
                   ))}
-                  {isLoading && (
+                  {isLoading && !isReplyStreaming && (
                     <div className="consciousness-message donna-thought">
                       <div className="message-bubble thinking-bubble">
                         <div className="thinking-animation">
@@ -1749,7 +1853,7 @@ const App = () => {
           {activeCalendarView === 'upcoming' && (
             <>
               {/* First Time Calendar User Message */}
-              {events.length === 0 && (
+              {events.length === 0 && monthEvents.length === 0 && (
                 <div className="first-time-calendar-message">
                   <p>Type your meeting, deadline, anniversary, or reminder in the chat—Donna does the rest. When your day is overbooked, she finds new slots and reschedules low-priority events. If you're packed with meetings, she'll remind you to carry a snack or make time for a meal. All reminders are set automatically. With Donna, your schedule takes care of itself. Just tell Donna in the chat.</p>
                 </div>
@@ -1830,7 +1934,10 @@ const App = () => {
           {/* Monthly View */}
           {activeCalendarView === 'monthly' && (
             <MonthlyCalendar 
-              events={events}
+              events={monthEvents}
+              currentDate={calendarMonth}
+              onNavigateMonth={navigateCalendarMonth}
+              onLoadEventDetails={loadEventDetails}
               onDeleteEvent={deleteEvent}
               onUpdateEvent={updateEvent}
             />
@@ -6,19 +6,10 @@ import { EVENT_CATEGORIES } from '../utils/eventProcessing';
 import EventCard from './EventCard';
 
 // Monthly Calendar Component - Futuristic Glassmorphic Design
-const MonthlyCalendar = ({ events, onDeleteEvent, onUpdateEvent }) => {
-  const [currentDate, setCurrentDate] = useState(new Date());
+// `events` holds the shown month only, with the grid's fields; the parent reloads them on navigation
+const MonthlyCalendar = ({ events, currentDate, onNavigateMonth, onLoadEventDetails, onDeleteEvent, onUpdateEvent }) => {
   const [selectedEvent, setSelectedEvent] = useState(null);
 
-  // Navigation functions
-  const navigateMonth = (direction) => {
-    setCurrentDate(prev => {
-      const newDate = new Date(prev);
-      newDate.setMonth(prev.getMonth() + direction);
-      return newDate;
-    });
-  };
-
   // Generate calendar grid
   const calendarData = useMemo(() => {
     const year = currentDate.getFullYear();
@@ -72,9 +63,10 @@ const MonthlyCalendar = ({ events, onDeleteEvent, onUpdateEvent }) => {
 
   const dayNames = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
 
-  const handleEventClick = (event, e) => {
+  const handleEventClick = async (event, e) => {
     e.stopPropagation();
-    setSelectedEvent(event);
+    // The card shows and edits the description and reminder, which the grid doesn't load
+    setSelectedEvent(await onLoadEventDetails(event));
   };
 
   const closeEventModal = () => {
@@ -89,7 +81,7 @@ const MonthlyCalendar = ({ events, onDeleteEvent, onUpdateEvent }) => {
           <Button
             variant="ghost"
             size="sm"
-            onClick={() => navigateMonth(-1)}
+            onClick={() => onNavigateMonth(-1)}
             className="nav-button prev-button"
           >
             <ChevronLeft className="nav-icon" />
@@ -105,7 +97,7 @@ const MonthlyCalendar = ({ events, onDeleteEvent, onUpdateEvent }) => {
           <Button
             variant="ghost"
             size="sm"
-            onClick={() => navigateMonth(1)}
+            onClick={() => onNavigateMonth(1)}
             className="nav-button next-button"
           >
             <ChevronRight className="nav-icon" />
@@ -115,8 +107,8 @@ const MonthlyCalendar = ({ events, onDeleteEvent, onUpdateEvent }) => {
         {/* Futuristic Stats Bar */}
         <div className="calendar-stats">
           <div className="stat-item">
-            <span className="stat-label">Events</span>
-            <span className="stat-value">{events.length}</span>
+            <span className="stat-label">Upcoming</span>
+            <span className="stat-value">{events.filter(e => new Date(e.datetime_utc) >= new Date()).length}</span>
           </div>
           <div className="stat-divider"></div>
           <div className="stat-item">
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Templated health confirmation test
+
+Runs the server's format_health_confirmation and load_health_confirmation_templates
+directly, no model or database involved. Checks that each log type picks the right
+variant pool (including the 7-hour sleep split), that the heavy-meal tip is only
+ever appended to heavy meals and only sometimes (seeded rng), and that a templates
+file overrides the pools it names while bad files and bad variants fall back to
+the built-ins.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# The server module reads these at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "donna_health_confirmation_test")
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from server import (  # noqa: E402
+    HealthProcessingResult, HEALTH_CONFIRMATION_TEMPLATES, HEALTH_HEAVY_MEAL_CALORIES,
+    format_health_confirmation, load_health_confirmation_templates
+)
+
+ROUNDS = 200
+
+def health_result(message_type, **values):
+    return HealthProcessingResult(detected=True, message_type=message_type, description="test", confidence=0.9, **values)
+
+def rendered_pool(pool, **values):
+    return {variant.format(**{"hydration_ml": 0, "calories": 0, "protein": 0, "sleep_hours": 0, "description": "test", **values})
+            for variant in HEALTH_CONFIRMATION_TEMPLATES[pool]}
+
+def check(passed, label):
+    print(f"   {'✅' if passed else '❌'} {label}")
+    return passed
+
+def write_templates(content):
+    handle = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    handle.write(content if isinstance(content, str) else json.dumps(content))
+    handle.close()
+    return handle.name
+
+def run_pool_tests():
+    results = []
+    rng = random.Random(42)
+
+    print("\n🔍 Pool selection...")
+    cases = [
+        ("7h sleep is rested", health_result("sleep", sleep_hours=7.0), rendered_pool("sleep_rested", sleep_hours=7.0)),
+        ("6.9h sleep is short", health_result("sleep", sleep_hours=6.9), rendered_pool("sleep_short", sleep_hours=6.9)),
+        ("hydration", health_result("hydration", hydration_ml=250), rendered_pool("hydration", hydration_ml=250)),
+        ("light meal", health_result("meal", calories=450, protein=30), rendered_pool("meal", calories=450, protein=30)),
+        ("unknown type", health_result("none"), rendered_pool("default")),
+    ]
+    for label, result, expected in cases:
+        seen = {format_health_confirmation(result, rng) for _ in range(ROUNDS)}
+        results.append(check(seen == expected, f"{label}: {len(seen)}/{len(expected)} variants used, none from other pools"))
+
+    print("\n🔍 Heavy-meal tip...")
+    heavy = health_result("meal", calories=HEALTH_HEAVY_MEAL_CALORIES, protein=40)
+    meal_lines = rendered_pool("meal", calories=HEALTH_HEAVY_MEAL_CALORIES, protein=40)
+    replies = [format_health_confirmation(heavy, random.Random(seed)) for seed in range(ROUNDS)]
+    with_tip = [reply for reply in replies if reply not in meal_lines]
+    tips_valid = all(
+        any(reply == f"{line} {tip}" for line in meal_lines for tip in HEALTH_CONFIRMATION_TEMPLATES["meal_balance_tip"])
+        for reply in with_tip
+    )
+    results.append(check(
+        0 < len(with_tip) < ROUNDS and tips_valid,
+        f"tip on {len(with_tip)}/{ROUNDS} heavy meals, always after a meal line"
+    ))
+    results.append(check(
+        format_health_confirmation(heavy, random.Random(7)) == format_health_confirmation(heavy, random.Random(7)),
+        "same seed, same confirmation"
+    ))
+
+    return results
+
+def run_override_tests():
+    results = []
+    builtins = {pool: list(variants) for pool, variants in HEALTH_CONFIRMATION_TEMPLATES.items()}
+
+    print("\n🔍 Template overrides...")
+    templates = load_health_confirmation_templates(write_templates({
+        "hydration": ["Drank {hydration_ml}ml", "{description.upper}", "{calories[0]}", "{unknown}", "{}", 42, "{hydration_ml"],
+        "sleep_short": "not a list",
+        "no_such_pool": ["x"],
+    }))
+    results.append(check(templates["hydration"] == ["Drank {hydration_ml}ml"], f"only the valid variant kept: {templates['hydration']}"))
+    results.append(check(templates["sleep_short"] == builtins["sleep_short"], "a pool that isn't a list keeps the built-ins"))
+    results.append(check("no_such_pool" not in templates, "unknown pools are ignored"))
+    results.append(check(templates["meal"] == builtins["meal"], "pools the file doesn't name keep the built-ins"))
+
+    emptied = load_health_confirmation_templates(write_templates({"meal": ["{calories.real}"]}))
+    results.append(check(emptied["meal"] == builtins["meal"], "a pool with no valid variants keeps the built-ins"))
+
+    for label, content in (("top-level list", ["x"]), ("invalid JSON", "{not json"), ("missing file", None)):
+        path = write_templates(content) if content is not None else "/nonexistent/templates.json"
+        results.append(check(load_health_confirmation_templates(path) == builtins, f"{label} falls back to the built-ins"))
+
+    return results
+
+def main():
+    results = run_pool_tests() + run_override_tests()
+    print(f"\n📊 {sum(results)}/{len(results)} checks passed")
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
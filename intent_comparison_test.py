@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Side-by-side comparison of the unified intent extractor against the legacy
+health/gift/event detectors, using the /api/admin/intent/compare endpoint
+
+The endpoint is for operators only: set ADMIN_EMAIL and ADMIN_PASSWORD to an
+account listed in the backend's ADMIN_EMAILS.
+"""
+
+import os
+import requests
+import sys
+import json
+
+TEST_MESSAGES = [
+    # Health
+    "drank a glass of water",
+    "had 2 bottles of water",
+    "slept 8 hours",
+    "I ate a chicken sandwich for lunch",
+    "went to bed at 11, woke up at 7",
+    # Delete
+    "undo hydration",
+    "delete last entry",
+    # Gift
+    "It's my mom's birthday tomorrow",
+    "Our anniversary is next Friday",
+    # Events
+    "I have a dentist appointment tomorrow at 3pm",
+    "Schedule a meeting with Sarah next week",
+    "remind me to call dad tonight",
+    # Plain chat
+    "How are you today?",
+    "What should I focus on this week?",
+]
+
+class IntentComparisonTester:
+    def __init__(self, base_url="https://donna-ai-assist.preview.emergentagent.com"):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.session_token = None
+
+    def login(self):
+        """Log in as the operator account to get a session token"""
+        data = {
+            "email": os.environ.get("ADMIN_EMAIL", ""),
+            "password": os.environ.get("ADMIN_PASSWORD", "")
+        }
+        if not data["email"] or not data["password"]:
+            print("❌ Set ADMIN_EMAIL and ADMIN_PASSWORD to an operator account")
+            return False
+        response = requests.post(f"{self.api_url}/auth/login", json=data, timeout=30)
+        if response.status_code != 200:
+            print(f"❌ Login failed: {response.status_code} {response.text[:200]}")
+            return False
+        self.session_token = response.json()["session_token"]
+        return True
+
+    def run_comparison(self, messages):
+        """Send the corpus to the comparison endpoint and print per-slot agreement"""
+        print(f"\n🔍 Comparing detectors on {len(messages)} messages...")
+        response = requests.post(
+            f"{self.api_url}/admin/intent/compare",
+            json={"messages": messages},
+            headers={"Authorization": f"Bearer {self.session_token}"},
+            timeout=300
+        )
+        if response.status_code != 200:
+            print(f"❌ Comparison failed: {response.status_code} {response.text[:300]}")
+            return False
+
+        report = response.json()
+        for result in report["results"]:
+            disagreements = [slot for slot, agreed in result["agreement"].items() if not agreed]
+            status = "✅" if not disagreements else f"⚠️  disagree on {', '.join(disagreements)}"
+            print(f"   {status} - '{result['message']}'")
+            if disagreements:
+                print(f"      legacy:  {json.dumps(result['legacy'])[:300]}")
+                print(f"      unified: {json.dumps(result['unified'])[:300]}")
+
+        print("\n📊 Agreement by slot:")
+        for slot, agreed in report["agreement"].items():
+            print(f"   {slot}: {agreed}/{report['total']} ({agreed / max(report['total'], 1) * 100:.0f}%)")
+        return True
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "https://donna-ai-assist.preview.emergentagent.com"
+    tester = IntentComparisonTester(base_url)
+    if not tester.login():
+        return 1
+    return 0 if tester.run_comparison(TEST_MESSAGES) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
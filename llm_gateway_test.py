@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+LLM gateway test against a local stub model server
+
+Runs the server's LlmGateway against a stdlib HTTP server that speaks the
+OpenAI-compatible /chat/completions API. Checks that registered prompts are sent
+with their system message, that a run of completions shares one pooled
+connection, that streamed replies arrive chunk by chunk, that per-call
+timeouts and unknown prompt ids fail fast, that admission control caps
+in-flight calls per user and rejects what can't be queued in time, and that
+the deadline budget and circuit breaker cut slow or failing calls short
+(a budget that runs out in the queue is a timeout, not overload, and a probe
+that never reaches the model doesn't hold the half-open slot).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# The server module reads these at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "donna_llm_gateway_test")
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from server import (  # noqa: E402
+    LlmGateway, LlmAdmissionController, LlmCircuitBreaker, LlmOverloadedError, LlmUnavailableError,
+    LLM_PROMPTS, llm_caller, start_llm_budget
+)
+
+SLOW_REPLY_SECONDS = 2.0
+STREAM_CHUNK_DELAY_SECONDS = 0.1
+BUSY_REPLY_SECONDS = 0.3
+
+class StubModelServer(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        StubModelServer.connections.add(self.client_address)
+        StubModelServer.requests.append(body)
+        system, user = body["messages"][0]["content"], body["messages"][1]["content"]
+        if user == "slow":
+            time.sleep(SLOW_REPLY_SECONDS)
+        if user == "busy":
+            time.sleep(BUSY_REPLY_SECONDS)
+        if user == "fail":
+            return self.send_error(500)
+        if body.get("stream"):
+            return self.stream_reply(user)
+
+        reply = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": f"echo: {user} ({len(system)} chars of system)"}}]
+        }).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def stream_reply(self, user):
+        """OpenAI-style SSE: one chunk per word, a pause between them, then [DONE]"""
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("connection", "close")
+        self.end_headers()
+        for word in user.split():
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(STREAM_CHUNK_DELAY_SECONDS)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+def make_breaker(**limits):
+    settings = {"window_seconds": 60, "min_calls": 1000, "error_rate": 0.5, "open_seconds": 30}
+    settings.update(limits)
+    return LlmCircuitBreaker(**settings)
+
+def make_gateway(base_url, admission=None, breaker=None):
+    return LlmGateway(base_url=base_url, api_key="test-key", model="stub-model", max_connections=10, prompts=LLM_PROMPTS,
+                      admission=admission or make_admission(), breaker=breaker or make_breaker())
+
+def make_admission(**limits):
+    settings = {"max_in_flight": 32, "max_in_flight_per_user": 3, "rate_per_second": 0, "burst": 1,
+                "max_queued": 200, "queue_timeout_seconds": 5}
+    settings.update(limits)
+    return LlmAdmissionController(**settings)
+
+async def call_as(gateway, user, text):
+    """One completion on behalf of `user`, as require_auth would tag it"""
+    llm_caller.set(user)
+    try:
+        await gateway.complete("donna_reply", text)
+        return "ok"
+    except LlmOverloadedError:
+        return "rejected"
+
+async def run_admission_tests(base_url):
+    results = []
+
+    print("\n🔍 Per-user cap (2 in flight per user, 6 calls from one user)...")
+    gateway = make_gateway(base_url, admission=make_admission(max_in_flight_per_user=2))
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(call_as(gateway, "heavy-user", "busy") for _ in range(6)))
+    elapsed = time.perf_counter() - start
+    peak = gateway.admission.metrics["peak_in_flight"]
+    results.append(check(
+        outcomes.count("ok") == 6 and peak == 2 and elapsed >= 3 * BUSY_REPLY_SECONDS,
+        f"peak {peak} in flight, 6 calls took {elapsed:.2f}s (3 waves of {BUSY_REPLY_SECONDS}s)"
+    ))
+
+    print("\n🔍 Another user is not stuck behind them...")
+    heavy = [asyncio.create_task(call_as(gateway, "heavy-user", "busy")) for _ in range(6)]
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    light = await call_as(gateway, "light-user", "hello")
+    light_ms = (time.perf_counter() - start) * 1000
+    await asyncio.gather(*heavy)
+    results.append(check(light == "ok" and light_ms < BUSY_REPLY_SECONDS * 1000, f"answered in {light_ms:.0f}ms"))
+    await gateway.close()
+
+    print("\n🔍 Queue timeout and full queue fail fast...")
+    gateway = make_gateway(base_url, admission=make_admission(max_in_flight=1, max_queued=2, queue_timeout_seconds=0.1))
+    outcomes = await asyncio.gather(*(call_as(gateway, f"user-{n}", "busy") for n in range(5)))
+    snapshot = gateway.admission.snapshot()
+    results.append(check(
+        outcomes.count("ok") == 1 and snapshot["rejected_queue_full"] >= 2 and
+        snapshot["rejected_queue_full"] + snapshot["rejected_timeout"] == 4,
+        f"{outcomes.count('ok')} ok, {snapshot['rejected_queue_full']} queue full, {snapshot['rejected_timeout']} timed out"
+    ))
+    results.append(check(
+        snapshot["in_flight"] == 0 and snapshot["queued"] == 0 and snapshot["active_users"] == 0,
+        f"gauges back to idle: {snapshot['in_flight']} in flight, {snapshot['queued']} queued"
+    ))
+    await gateway.close()
+
+    print("\n🔍 Token bucket (5/s, burst 2, 6 calls)...")
+    gateway = make_gateway(base_url, admission=make_admission(rate_per_second=5, burst=2))
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(call_as(gateway, f"user-{n}", "hello") for n in range(6)))
+    elapsed = time.perf_counter() - start
+    results.append(check(outcomes.count("ok") == 6 and elapsed >= 0.7, f"6 calls took {elapsed:.2f}s (>= 0.8s expected)"))
+    await gateway.close()
+
+    return results
+
+async def outcome_of(call):
+    try:
+        await call
+        return "ok"
+    except asyncio.TimeoutError:
+        return "timeout"
+    except LlmUnavailableError:
+        return "short_circuited"
+    except Exception:
+        return "error"
+
+async def run_budget_and_breaker_tests(base_url):
+    results = []
+
+    print("\n🔍 Deadline budget (1s for the request, detector gets half)...")
+    gateway = make_gateway(base_url)
+
+    async def request_with_budget():
+        start_llm_budget(1.0)
+        start = time.perf_counter()
+        outcome = await outcome_of(gateway.complete("health_detection", "slow"))
+        return outcome, time.perf_counter() - start
+
+    outcome, elapsed = await asyncio.create_task(request_with_budget())
+    results.append(check(outcome == "timeout" and 0.4 <= elapsed < 0.8, f"{outcome} after {elapsed:.2f}s"))
+
+    async def spent_budget():
+        start_llm_budget(0)
+        return await outcome_of(gateway.complete("donna_reply", "hello"))
+
+    outcome = await asyncio.create_task(spent_budget())
+    results.append(check(outcome == "timeout", f"spent budget: {outcome} without calling the model"))
+    await gateway.close()
+
+    print("\n🔍 Budget runs out while queued (0.2s budget, 5s queue timeout)...")
+    gateway = make_gateway(base_url, admission=make_admission(max_in_flight=1))
+
+    async def queued_behind_busy_call():
+        start_llm_budget(0.2)
+        start = time.perf_counter()
+        outcome = await outcome_of(gateway.complete("donna_reply", "hello"))
+        return outcome, time.perf_counter() - start
+
+    busy = asyncio.create_task(call_as(gateway, "user-1", "busy"))
+    await asyncio.sleep(0.05)
+    outcome, elapsed = await asyncio.create_task(queued_behind_busy_call())
+    await busy
+    snapshot = gateway.admission.snapshot()
+    results.append(check(
+        outcome == "timeout" and elapsed < BUSY_REPLY_SECONDS and snapshot["budget_expired"] == 1 and snapshot["rejected_timeout"] == 0,
+        f"{outcome} after {elapsed:.2f}s, not counted as overload"
+    ))
+    await gateway.close()
+
+    print("\n🔍 Circuit breaker (opens at 50% errors over 4 calls, 0.5s open)...")
+    breaker = make_breaker(min_calls=4, open_seconds=0.5)
+    gateway = make_gateway(base_url, breaker=breaker)
+    outcomes = [await outcome_of(gateway.complete("donna_reply", text)) for text in ("hello", "fail", "hello", "fail")]
+    results.append(check(breaker.state == "open", f"{outcomes} -> {breaker.state}"))
+
+    start = time.perf_counter()
+    outcome = await outcome_of(gateway.complete("health_confirmation", "hello"))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    results.append(check(outcome == "short_circuited" and elapsed_ms < 50, f"while open: {outcome} in {elapsed_ms:.1f}ms"))
+
+    await asyncio.sleep(0.6)
+    spent = await asyncio.create_task(spent_budget())
+    results.append(check(
+        spent == "timeout" and breaker.probe_started_at is None,
+        f"probe with a spent budget: {spent}, probe slot freed"
+    ))
+    probe = await outcome_of(gateway.complete("donna_reply", "hello"))
+    results.append(check(probe == "ok" and breaker.state == "closed", f"after the open period: probe {probe} -> {breaker.state}"))
+    await gateway.close()
+
+    return results
+
+def check(passed, label):
+    print(f"   {'✅' if passed else '❌'} {label}")
+    return passed
+
+async def run_tests(base_url):
+    gateway = make_gateway(base_url)
+    results = []
+
+    print("\n🔍 Registered prompt...")
+    reply = await gateway.complete("health_detection", "drank a glass of water")
+    sent = StubModelServer.requests[-1]
+    results.append(check(reply.startswith("echo: drank a glass of water"), f"reply: {reply}"))
+    results.append(check(
+        sent["model"] == "stub-model" and sent["messages"][0]["content"] == LLM_PROMPTS["health_detection"].system_message,
+        "model and system message taken from the registry"
+    ))
+
+    print("\n🔍 Connection reuse over 20 sequential completions...")
+    StubModelServer.connections.clear()
+    start = time.perf_counter()
+    for turn in range(20):
+        await gateway.complete("donna_reply", f"turn {turn}", session_id="user-1")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    results.append(check(
+        len(StubModelServer.connections) == 1,
+        f"{len(StubModelServer.connections)} connection(s) opened, {elapsed_ms / 20:.1f}ms per call"
+    ))
+
+    print("\n🔍 Streamed reply...")
+    words = "you are all set for tomorrow"
+    start = time.perf_counter()
+    chunks, first_chunk_ms = [], None
+    async for chunk in gateway.stream("donna_reply", words):
+        first_chunk_ms = first_chunk_ms or (time.perf_counter() - start) * 1000
+        chunks.append(chunk)
+    total_ms = (time.perf_counter() - start) * 1000
+    results.append(check(
+        "".join(chunks).strip() == words and len(chunks) == len(words.split()),
+        f"{len(chunks)} chunks, first after {first_chunk_ms:.0f}ms of {total_ms:.0f}ms"
+    ))
+
+    print("\n🔍 Per-call timeout...")
+    start = time.perf_counter()
+    try:
+        await gateway.complete("gift_detection", "slow", timeout=0.3)
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    elapsed = time.perf_counter() - start
+    results.append(check(timed_out and elapsed < SLOW_REPLY_SECONDS, f"timed out after {elapsed:.2f}s"))
+
+    print("\n🔍 Unknown prompt id...")
+    try:
+        await gateway.complete("not_a_prompt", "hello")
+        unknown_rejected = False
+    except KeyError:
+        unknown_rejected = True
+    results.append(check(unknown_rejected, "KeyError raised"))
+
+    print("\n🔍 Metrics...")
+    prompts = gateway.snapshot()["prompts"]
+    results.append(check(
+        prompts["donna_reply"]["calls"] == 21 and prompts["donna_reply"]["streams"] == 1 and prompts["gift_detection"]["timeouts"] == 1,
+        json.dumps(prompts)
+    ))
+
+    await gateway.close()
+    results += await run_admission_tests(base_url)
+    results += await run_budget_and_breaker_tests(base_url)
+    print(f"\n📊 {sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubModelServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        return 0 if asyncio.run(run_tests(f"http://127.0.0.1:{server.server_address[1]}/v1")) else 1
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    sys.exit(main())
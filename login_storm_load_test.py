@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Login storm load test for the bcrypt worker pool
+
+Measures latency of a cheap endpoint while many logins run at once. With
+bcrypt on the worker pool the probe latency should stay roughly flat; when
+bcrypt ran on the event loop every login froze the worker for 100-300ms.
+"""
+
+import requests
+import sys
+import time
+import uuid
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PROBE_ENDPOINT = "notifications/vapid-public-key"
+PASSWORD = "TestPass123"
+
+class LoginStormTester:
+    def __init__(self, base_url="https://donna-ai-assist.preview.emergentagent.com", logins=60, concurrency=20):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.logins = logins
+        self.concurrency = concurrency
+        self.email = f"login_storm_{uuid.uuid4().hex[:8]}@example.com"
+
+    def register(self):
+        response = requests.post(
+            f"{self.api_url}/auth/register",
+            json={"email": self.email, "password": PASSWORD},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print(f"❌ Registration failed: {response.status_code} {response.text[:200]}")
+            return False
+        return True
+
+    def probe_latencies(self, samples, stop_event=None):
+        """Time the probe endpoint, either a fixed number of times or until stop_event is set"""
+        latencies = []
+        while (stop_event is None and len(latencies) < samples) or (stop_event is not None and not stop_event.is_set()):
+            started = time.perf_counter()
+            requests.get(f"{self.api_url}/{PROBE_ENDPOINT}", timeout=30)
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.02)
+        return latencies
+
+    def login(self, _):
+        response = requests.post(
+            f"{self.api_url}/auth/login",
+            json={"email": self.email, "password": PASSWORD},
+            timeout=60
+        )
+        return response.status_code == 200
+
+    @staticmethod
+    def summarize(label, latencies):
+        ordered = sorted(latencies)
+        p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+        print(f"   {label}: n={len(ordered)} p50={statistics.median(ordered):.1f}ms p95={p95:.1f}ms max={ordered[-1]:.1f}ms")
+        return p95
+
+    def run(self):
+        print("\n🔍 Measuring baseline probe latency...")
+        baseline = self.probe_latencies(40)
+
+        print(f"\n🔍 Running {self.logins} logins with concurrency {self.concurrency}...")
+        stop_event = threading.Event()
+        during = []
+        probe_thread = threading.Thread(target=lambda: during.extend(self.probe_latencies(0, stop_event)))
+        probe_thread.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(self.login, range(self.logins)))
+        storm_seconds = time.perf_counter() - started
+        stop_event.set()
+        probe_thread.join()
+
+        print(f"\n📊 {sum(results)}/{len(results)} logins succeeded in {storm_seconds:.1f}s")
+        baseline_p95 = self.summarize("baseline", baseline)
+        during_p95 = self.summarize("during storm", during)
+
+        metrics = requests.get(f"{self.api_url}/metrics/password-hashing", timeout=30)
+        if metrics.status_code == 200:
+            print(f"   password pool: {metrics.json()}")
+
+        # Allow some noise from the network and the extra load, but not a stall per login
+        flat = during_p95 <= baseline_p95 * 2 + 50
+        print(f"\n{'✅' if flat else '❌'} Probe p95 {baseline_p95:.1f}ms -> {during_p95:.1f}ms during the login storm")
+        return flat and all(results)
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "https://donna-ai-assist.preview.emergentagent.com"
+    tester = LoginStormTester(base_url)
+    if not tester.register():
+        return 1
+    return 0 if tester.run() else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
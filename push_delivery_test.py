@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Web Push delivery engine test against a local fake push service
+
+Runs the server's PushDeliveryEngine directly: payloads are really encrypted and
+VAPID-signed, then posted to a stdlib HTTP server that answers with the status
+codes real push services use. Checks that each response maps to the right outcome
+that a burst of deliveries runs concurrently over pooled connections, and that a
+fan-out to several devices gets through to the live ones and flags the gone ones
+for pruning.
+"""
+
+import asyncio
+import base64
+import os
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+# The server module reads these at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "donna_push_delivery_test")
+os.environ.setdefault(
+    "VAPID_PRIVATE_KEY",
+    b64url(ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value.to_bytes(32, "big"))
+)
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from server import PushDeliveryEngine, push_engine, send_to_subscriptions, combine_push_outcomes  # noqa: E402
+
+FAKE_RESPONSES = {
+    "/push/ok": 201,
+    "/push/gone": 410,
+    "/push/throttled": 429,
+    "/push/unavailable": 503,
+    "/push/rejected": 400,
+}
+FAKE_LATENCY_SECONDS = 0.1
+
+class FakePushService(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        time.sleep(FAKE_LATENCY_SECONDS)
+        status = FAKE_RESPONSES.get(self.path.split("?")[0], 404)
+        if status <= 202 and (
+            self.headers.get("content-encoding") != "aes128gcm" or
+            not self.headers.get("authorization", "").startswith("vapid ")
+        ):
+            status = 400
+        self.send_response(status)
+        self.send_header("content-length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def make_subscription(base_url, path):
+    """A subscription with real browser-style keys so encryption actually runs"""
+    receiver_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        encoding=serialization.Encoding.X962,
+        format=serialization.PublicFormat.UncompressedPoint
+    )
+    return {
+        "endpoint": f"{base_url}{path}",
+        "p256dh_key": b64url(receiver_key),
+        "auth_key": b64url(secrets.token_bytes(16)),
+    }
+
+async def run_tests(base_url):
+    engine = PushDeliveryEngine(max_concurrency=50, timeout_seconds=5, crypto_workers=4, ttl_seconds=0)
+    payload = {"title": "Test", "body": "Push delivery engine test", "type": "test"}
+    passed = 0
+    expected = {
+        "/push/ok": "sent",
+        "/push/gone": "gone",
+        "/push/missing": "gone",
+        "/push/throttled": "retryable",
+        "/push/unavailable": "retryable",
+        "/push/rejected": "failed",
+    }
+
+    print("\n🔍 Outcome classification...")
+    for path, status in expected.items():
+        outcome = await engine.send(make_subscription(base_url, path), payload)
+        ok = outcome.status == status
+        passed += ok
+        print(f"   {'✅' if ok else '❌'} {path}: {outcome.status} ({outcome.status_code}), expected {status}")
+
+    print("\n🔍 Unreachable push service...")
+    outcome = await engine.send(make_subscription("http://127.0.0.1:9", "/push/ok"), payload)
+    ok = outcome.status == "retryable"
+    passed += ok
+    print(f"   {'✅' if ok else '❌'} connection error: {outcome.status}, expected retryable")
+
+    burst = 100
+    print(f"\n🔍 Burst of {burst} deliveries ({FAKE_LATENCY_SECONDS * 1000:.0f}ms per push)...")
+    subscriptions = [make_subscription(base_url, "/push/ok") for _ in range(burst)]
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(engine.send(s, payload) for s in subscriptions))
+    elapsed = time.perf_counter() - start
+    sent = sum(1 for o in outcomes if o.status == "sent")
+    serial_estimate = burst * FAKE_LATENCY_SECONDS
+    ok = sent == burst and elapsed < serial_estimate / 2
+    passed += ok
+    print(f"   {'✅' if ok else '❌'} {sent}/{burst} sent in {elapsed:.2f}s (serial would be ~{serial_estimate:.1f}s)")
+
+    await engine.close()
+
+    print("\n🔍 Fan-out to 3 live, 2 gone and 1 rejected device...")
+    paths = ["/push/ok"] * 3 + ["/push/gone", "/push/missing", "/push/rejected"]
+    subscriptions = [make_subscription(base_url, path) for path in paths]
+    outcomes = await send_to_subscriptions(subscriptions, payload)
+    sent = [o for o in outcomes if o.status == "sent" and o.status_code == 201]
+    gone = {o.endpoint for o in outcomes if o.status == "gone"}
+    expected_gone = {s["endpoint"] for s in subscriptions if s["endpoint"].endswith(("/push/gone", "/push/missing"))}
+    # fan_out_notification deletes exactly the gone endpoints; at least one device must really get the push
+    ok = len(sent) == 3 and gone == expected_gone and combine_push_outcomes(outcomes).status == "sent"
+    passed += ok
+    print(f"   {'✅' if ok else '❌'} {len(sent)} delivered, {len(gone)} to prune, combined: {combine_push_outcomes(outcomes).status}")
+    await push_engine.close()
+
+    total = len(expected) + 3
+    print(f"\n📊 {passed}/{total} checks passed")
+    return passed == total
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePushService)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        return 0 if asyncio.run(run_tests(base_url)) else 1
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Fan-out latency benchmark for multi-device push delivery
+
+Sends one notification to 1, 5 and 20 devices through the server's push engine,
+first one device after another (the old single-device loop) and then with the
+concurrent fan-out used by fan_out_notification. Pushes go to a local fake push
+service that answers after a fixed delay, so the numbers show how latency grows
+with the number of devices. Every round must reach every device: a push the
+fake service rejects (bad encryption or VAPID headers) stops the benchmark.
+"""
+
+import asyncio
+import base64
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+# The server module reads these at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "donna_push_fanout_benchmark")
+os.environ.setdefault(
+    "VAPID_PRIVATE_KEY",
+    b64url(ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value.to_bytes(32, "big"))
+)
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from server import push_engine, send_to_subscriptions, combine_push_outcomes  # noqa: E402
+
+DEVICE_COUNTS = [1, 5, 20]
+ROUNDS = 5
+FAKE_LATENCY_SECONDS = 0.08
+
+class FakePushService(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    accepted = 0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("content-length", 0)))
+        time.sleep(FAKE_LATENCY_SECONDS)
+        # Only accept what a real push service would: an encrypted body with VAPID auth
+        if (not body or self.headers.get("content-encoding") != "aes128gcm" or
+                not self.headers.get("authorization", "").startswith("vapid ")):
+            self.send_response(400)
+            self.send_header("content-length", "0")
+            self.end_headers()
+            return
+        FakePushService.accepted += 1
+        self.send_response(201)
+        self.send_header("content-length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def make_subscription(base_url, device):
+    receiver_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        encoding=serialization.Encoding.X962,
+        format=serialization.PublicFormat.UncompressedPoint
+    )
+    return {
+        "endpoint": f"{base_url}/push/device-{device}",
+        "p256dh_key": b64url(receiver_key),
+        "auth_key": b64url(secrets.token_bytes(16)),
+    }
+
+async def serial_send(subscriptions, payload):
+    return [await push_engine.send(subscription, payload) for subscription in subscriptions]
+
+async def measure(send, subscriptions, payload):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        outcomes = await send(subscriptions, payload)
+        timings.append((time.perf_counter() - start) * 1000)
+        # Every device has to get it - one success would already make the combined status "sent"
+        failed = [outcome for outcome in outcomes if outcome.status != "sent"]
+        if failed or combine_push_outcomes(outcomes).status != "sent":
+            raise RuntimeError(f"Delivery failed for {len(failed)}/{len(outcomes)} device(s): {failed[:1]}")
+    return statistics.median(timings)
+
+async def run_benchmark(base_url):
+    payload = {"title": "Benchmark", "body": "Fan-out latency", "type": "test"}
+    # Warm up the connection pool and the crypto workers; this also checks a push really gets through
+    warmup = await send_to_subscriptions([make_subscription(base_url, "warmup")], payload)
+    if warmup[0].status != "sent" or FakePushService.accepted != 1:
+        raise RuntimeError(f"Warm-up push was not accepted: {warmup[0]}")
+
+    print(f"\n📊 Median latency over {ROUNDS} rounds ({FAKE_LATENCY_SECONDS * 1000:.0f}ms per push)")
+    print(f"   {'devices':>7}  {'serial':>10}  {'fan-out':>10}  {'speedup':>8}")
+    for devices in DEVICE_COUNTS:
+        subscriptions = [make_subscription(base_url, device) for device in range(devices)]
+        serial_ms = await measure(serial_send, subscriptions, payload)
+        fanout_ms = await measure(send_to_subscriptions, subscriptions, payload)
+        print(f"   {devices:>7}  {serial_ms:>8.0f}ms  {fanout_ms:>8.0f}ms  {serial_ms / fanout_ms:>7.1f}x")
+
+    print(f"\n✅ {FakePushService.accepted} pushes accepted by the fake push service")
+    await push_engine.close()
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePushService)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        asyncio.run(run_benchmark(f"http://127.0.0.1:{server.server_address[1]}"))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())